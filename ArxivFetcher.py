@@ -1,51 +1,56 @@
-import os
-import json
-import jsonlines
-import re
+import asyncio
+import httpx
 import requests
+import xml.etree.ElementTree as ET
+from utils import atom
+from utils.arxiv_id import ArxivIdIndex, parse_arxiv_id
+from utils.metrics import metrics
+from utils.ratelimit import TokenBucket
+from utils.storage import open_storage
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+# arXiv API使用条款：每3秒不超过1次请求
+ARXIV_RATE_LIMIT = 1 / 3
 
 
 class ArxivAbstractFetcher:
-    def __init__(self, links, storage_path="abstracts.json"):
+    def __init__(self, links, storage_path="abstracts.json", batch_size=100, flush_every=50,
+                 api_url=ARXIV_API_URL):
         """
         初始化类，接受arXiv链接列表和存储路径
         :param links: arXiv链接列表
-        :param storage_path: 存储JSON或JSONL文件的路径
+        :param storage_path: 存储文件路径，按扩展名选择JSON、JSONL或SQLite后端
+        :param batch_size: 每次API请求打包的ID数量，小于等于1时逐篇请求
+        :param flush_every: 累计多少篇论文后批量落盘
+        :param api_url: arXiv API地址，基准测试时指向本地替身服务
         """
         self.links = links
         self.storage_path = storage_path
-        self.processed_data = self._load_processed_data()
+        self.batch_size = batch_size
+        self.api_url = api_url
+        self.processed_data = open_storage(storage_path, table="abstracts", flush_every=flush_every)
+        # 按基础ID索引已处理的论文，同一论文的不同链接写法(abs/pdf、带版本号)只获取一次；
+        # 以前获取失败的记录不计入，下次运行重新获取
+        self.id_index = ArxivIdIndex(key for key, record in self.processed_data.items()
+                                     if not (isinstance(record, dict) and "error" in record))
 
-    def _load_processed_data(self):
+    def _extract_arxiv_id(self, link):
         """
-        加载已处理的链接及其摘要
-        :return: 已处理的数据字典
+        从arXiv链接中提取ID
+        :param link: arXiv链接
+        :return: arXiv ID，链接带版本号时保留版本号
         """
-        if not os.path.exists(self.storage_path):
-            return {}
-        try:
-            if self.storage_path.endswith('.json'):
-                with open(self.storage_path, 'r', encoding='utf-8') as file:
-                    return json.load(file)
-            elif self.storage_path.endswith('.jsonl'):
-                processed_data = {}
-                with jsonlines.open(self.storage_path, 'r') as reader:
-                    for item in reader:
-                        processed_data[item["link"]] = item["abstract"]
-                return processed_data
-        except Exception as e:
-            print(f"加载存储文件失败: {e}")
-            return {}
+        arxiv_id = parse_arxiv_id(link)
+        if arxiv_id is None:
+            return None
+        return f"{arxiv_id.base}v{arxiv_id.version}" if arxiv_id.version else arxiv_id.base
 
-    def _extract_arxiv_id(self, link):
+    def find_processed(self, link):
         """
-        从arXiv链接中提取ID
         :param link: arXiv链接
-        :return: arXiv ID
+        :return: 同一论文已存储的键，未处理过或以前获取失败时返回None(本次运行中失败的仍返回其键)
         """
-        pattern = r'arxiv\.org/(?:abs|pdf)/([0-9]+\.[0-9]+(?:v[0-9]+)?)'
-        match = re.search(pattern, link)
-        return match.group(1) if match else None
+        return self.id_index.get(link)
 
     def fetch_abstract(self, arxiv_id):
         """
@@ -53,69 +58,290 @@ class ArxivAbstractFetcher:
         :param arxiv_id: arXiv ID
         :return: 摘要文本
         """
-        url = f"http://export.arxiv.org/api/query?id_list={arxiv_id}"
+        url = f"{self.api_url}?id_list={arxiv_id}"
         try:
-            response = requests.get(url)
+            with metrics.timer("http.arxiv"):
+                response = requests.get(url)
             response.raise_for_status()
-
-            entry_match = re.search(r'<entry>(.*?)</entry>', response.text, re.DOTALL)
-            if not entry_match:
-                return {"error": "无法解析论文元数据"}
-
-            entry = entry_match.group(1)
-            title = re.search(r'<title>(.*?)</title>', entry, re.DOTALL)
-            abstract = re.search(r'<summary>(.*?)</summary>', entry, re.DOTALL)
-            authors = re.findall(r'<name>(.*?)</name>', entry)
-            categories = re.search(r'<category term="(.*?)"', entry)
-            published = re.search(r'<published>(.*?)</published>', entry)
-
-            return {
-                "id": arxiv_id,
-                'link': f"https://arxiv.org/pdf/{arxiv_id}",
-                "title": title.group(1).strip() if title else "标题未找到",
-                "abstract": abstract.group(1).strip() if abstract else "摘要未找到",
-                "authors": authors,
-                "categories": categories.group(1) if categories else "未知分类",
-                "published": published.group(1) if published else "未知日期"
-            }
+            return self._parse_single(response.text, arxiv_id)
 
         except requests.RequestException as e:
             return {"error": f"获取元数据失败: {e}"}
 
+    def fetch_abstracts_batch(self, arxiv_ids):
+        """
+        通过一次arXiv API请求批量获取多篇论文的摘要
+        :param arxiv_ids: arXiv ID列表
+        :return: (以请求ID为键的摘要字典, 响应中缺失的ID列表)
+        """
+        params = {"id_list": ",".join(arxiv_ids), "max_results": len(arxiv_ids)}
+        try:
+            with metrics.timer("http.arxiv"):
+                response = requests.get(self.api_url, params=params)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"批量获取元数据失败: {e}")
+            return {}, list(arxiv_ids)
+        return self._parse_feed(response.text, arxiv_ids)
+
+    def _parse_single(self, text, arxiv_id):
+        """
+        解析单篇论文的API响应
+        :param text: 响应文本
+        :param arxiv_id: arXiv ID
+        :return: 论文元数据字典
+        """
+        try:
+            entries = atom.parse_feed(text)
+        except ET.ParseError as e:
+            return {"error": f"无法解析论文元数据: {e}"}
+        entries = [entry for entry in entries if entry["id"]]
+        if not entries:
+            return {"error": "无法解析论文元数据"}
+        return self._build_record(entries[0], arxiv_id)
+
+    def _parse_feed(self, text, arxiv_ids):
+        """
+        将批量请求返回的Feed一次性拆分为逐篇记录
+        :param text: 响应文本
+        :param arxiv_ids: 请求的arXiv ID列表
+        :return: (以请求ID为键的摘要字典, 响应中缺失的ID列表)
+        """
+        # 同时登记带版本号和不带版本号的ID
+        entries = {}
+        try:
+            for entry in atom.parse_feed(text):
+                if not entry["id"]:
+                    continue
+                if entry["version"] is not None:
+                    entries[f"{entry['id']}v{entry['version']}"] = entry
+                entries.setdefault(entry["id"], entry)
+        except ET.ParseError as e:
+            print(f"无法解析批量响应: {e}")
+
+        results = {}
+        missing = []
+        for arxiv_id in arxiv_ids:
+            entry = entries.get(arxiv_id)
+            if entry is None:
+                missing.append(arxiv_id)
+            else:
+                results[arxiv_id] = self._build_record(entry, arxiv_id)
+        return results, missing
+
+    @staticmethod
+    def _build_record(entry, arxiv_id):
+        """
+        将解析出的条目转换为存储格式
+        :param entry: utils.atom解析出的条目
+        :param arxiv_id: 请求的arXiv ID
+        :return: 论文元数据字典
+        """
+        return {
+            "id": arxiv_id,
+            'link': f"https://arxiv.org/pdf/{arxiv_id}",
+            "title": entry["title"] or "标题未找到",
+            "abstract": entry["abstract"] or "摘要未找到",
+            "authors": entry["authors"],
+            "categories": entry["categories"],
+            "primary_category": entry["primary_category"] or "未知分类",
+            "published": entry["published"] or "未知日期",
+            "updated": entry["updated"],
+            "version": entry["version"],
+            "doi": entry["doi"]
+        }
+
     def fetch_and_store_abstracts(self):
         """
         获取摘要并存储到文件中
         """
+        with metrics.stage("fetch"):
+            self._fetch_and_store_pending(self._pending_links())
+
+    def _fetch_and_store_pending(self, pending):
+        """
+        逐批获取并存储
+        :param pending: (链接, arXiv ID)列表
+        """
+        if self.batch_size <= 1:
+            for link, arxiv_id in pending:
+                self._store(link, self.fetch_abstract(arxiv_id))
+            self.processed_data.flush()
+            return
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            results, missing = self.fetch_abstracts_batch([arxiv_id for _, arxiv_id in batch])
+            if missing:
+                metrics.count("arxiv.missing", len(missing))
+                print(f"批量响应中缺失 {len(missing)} 个ID，逐个重试: {missing}")
+            for link, arxiv_id in batch:
+                abstract = results.get(arxiv_id)
+                if abstract is None:
+                    abstract = self.fetch_abstract(arxiv_id)
+                self._store(link, abstract)
+            self.processed_data.flush()
+
+    def _pending_links(self):
+        """
+        过滤出尚未处理的有效链接
+        :return: (链接, arXiv ID)列表
+        """
+        pending = []
+        seen = ArxivIdIndex()
         for link in self.links:
-            if link in self.processed_data:
+            if link in self.id_index:
                 print(f"跳过已处理链接: {link}")
                 continue
 
             arxiv_id = self._extract_arxiv_id(link)
-            if arxiv_id:
-                abstract = self.fetch_abstract(arxiv_id)
-                self.processed_data[link] = abstract
-                self._append_to_storage(link, abstract)
-                print(f"处理完成: {link}")
-            else:
+            if not arxiv_id:
                 print(f"无效的arXiv链接: {link}")
+            elif seen.add(link):
+                pending.append((link, arxiv_id))
+            else:
+                print(f"跳过重复链接: {link} (同 {seen.get(link)})")
+        return pending
+
+    def _store(self, link, abstract):
+        """
+        记录单篇论文的结果
+        :param link: arXiv链接
+        :param abstract: 摘要内容
+        """
+        self._append_to_storage(link, abstract)
+        self.id_index.add(link)
+        print(f"处理完成: {link}")
 
     def _append_to_storage(self, link, abstract):
         """
-        将新的链接及摘要追加到存储文件
+        将新的链接及摘要写入存储后端，按flush_every批量落盘
         :param link: arXiv链接
         :param abstract: 摘要内容
         """
         try:
-            if self.storage_path.endswith('.json'):
-                with open(self.storage_path, 'w', encoding='utf-8') as file:
-                    json.dump(self.processed_data, file, ensure_ascii=False, indent=4)
-            elif self.storage_path.endswith('.jsonl'):
-                with jsonlines.open(self.storage_path, mode='a') as writer:
-                    writer.write({"link": link, "abstract": abstract})
+            self.processed_data.put(link, abstract)
         except Exception as e:
             print(f"存储失败: {e}")
 
+    def close(self):
+        """
+        落盘剩余记录并释放存储后端
+        """
+        self.processed_data.close()
+
+
+class AsyncArxivFetcher(ArxivAbstractFetcher):
+    def __init__(self, links, storage_path="abstracts.json", batch_size=100, flush_every=50,
+                 max_concurrency=None, rate=ARXIV_RATE_LIMIT, burst=1, timeout=30.0, api_url=ARXIV_API_URL):
+        """
+        基于asyncio的并发摘要获取器，复用长连接并按arXiv限速策略发送请求
+        :param links: arXiv链接列表
+        :param storage_path: 存储文件路径，按扩展名选择JSON、JSONL或SQLite后端
+        :param batch_size: 每次API请求打包的ID数量，小于等于1时逐篇请求
+        :param flush_every: 累计多少篇论文后批量落盘
+        :param max_concurrency: 同时在途的最大请求数；为None时，真实arXiv API遵循其单连接策略使用1，其他地址使用4
+        :param rate: 每秒允许的请求数，默认遵循arXiv的每3秒1次
+        :param burst: 令牌桶容量，即允许的最大突发请求数
+        :param timeout: 单次请求超时秒数
+        :param api_url: arXiv API地址
+        """
+        super().__init__(links, storage_path, batch_size, flush_every, api_url)
+        if max_concurrency is None:
+            # 批量查询可能超过3秒，多个并发连接会违反arXiv的单连接策略
+            max_concurrency = 1 if api_url == ARXIV_API_URL else 4
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+
+    def make_client(self):
+        """
+        创建复用长连接的HTTP客户端
+        """
+        limits = httpx.Limits(max_connections=self.max_concurrency,
+                              max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(limits=limits, timeout=self.timeout)
+
+    def make_limiters(self):
+        """
+        创建速率限制器和并发信号量
+        :return: (TokenBucket, Semaphore)
+        """
+        return TokenBucket(self.rate, self.burst), asyncio.Semaphore(self.max_concurrency)
+
+    async def _get(self, client, limiter, sem, params):
+        """
+        在并发和速率限制下发送一次API请求
+        :return: 响应文本
+        """
+        async with sem:
+            await limiter.acquire()
+            with metrics.timer("http.arxiv"):
+                response = await client.get(self.api_url, params=params)
+            response.raise_for_status()
+            return response.text
+
+    async def fetch_abstract_async(self, client, limiter, sem, arxiv_id):
+        """
+        异步获取单篇论文摘要
+        :param arxiv_id: arXiv ID
+        :return: 论文元数据字典
+        """
+        try:
+            text = await self._get(client, limiter, sem, {"id_list": arxiv_id})
+            return self._parse_single(text, arxiv_id)
+        except httpx.HTTPError as e:
+            return {"error": f"获取元数据失败: {e}"}
+
+    async def _fetch_batch_async(self, client, limiter, sem, batch):
+        """
+        异步获取一批论文摘要，响应中缺失的ID逐个重试后存储
+        :param batch: (链接, arXiv ID)列表
+        :return: (链接, 摘要)列表
+        """
+        arxiv_ids = [arxiv_id for _, arxiv_id in batch]
+        params = {"id_list": ",".join(arxiv_ids), "max_results": len(arxiv_ids)}
+        try:
+            text = await self._get(client, limiter, sem, params)
+            results, missing = self._parse_feed(text, arxiv_ids)
+        except httpx.HTTPError as e:
+            print(f"批量获取元数据失败: {e}")
+            results, missing = {}, arxiv_ids
+
+        if missing:
+            metrics.count("arxiv.missing", len(missing))
+            print(f"批量响应中缺失 {len(missing)} 个ID，逐个重试: {missing}")
+        stored = []
+        for link, arxiv_id in batch:
+            abstract = results.get(arxiv_id)
+            if abstract is None:
+                abstract = await self.fetch_abstract_async(client, limiter, sem, arxiv_id)
+            self._store(link, abstract)
+            stored.append((link, abstract))
+        return stored
+
+    async def fetch_and_store_abstracts_async(self):
+        """
+        并发获取摘要并存储到文件中
+        """
+        pending = self._pending_links()
+        size = max(self.batch_size, 1)
+        batches = [pending[start:start + size] for start in range(0, len(pending), size)]
+
+        limiter, sem = self.make_limiters()
+        with metrics.stage("fetch"):
+            async with self.make_client() as client:
+                await asyncio.gather(*(self._fetch_batch_async(client, limiter, sem, batch)
+                                       for batch in batches))
+            self.processed_data.flush()
+
+    def fetch_and_store_abstracts(self):
+        """
+        同步入口，供main.py等同步代码调用
+        """
+        asyncio.run(self.fetch_and_store_abstracts_async())
+
 
 # 主程序
 if __name__ == "__main__":
@@ -126,8 +352,9 @@ if __name__ == "__main__":
     ]
 
     # 使用摘要提取类
-    storage_path = "abstracts.json"  # 或者使用 "abstracts.jsonl"
+    storage_path = "abstracts.json"  # 或者使用 "abstracts.jsonl" / "papers.db"
     fetcher = ArxivAbstractFetcher(arxiv_links, storage_path)
 
     # 获取摘要并存储
     fetcher.fetch_and_store_abstracts()
+    fetcher.close()
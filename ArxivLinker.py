@@ -1,4 +1,13 @@
+import os
 import re
+import json
+from utils.storage import atomic_write
+from utils.arxiv_id import ArxivIdIndex, ID_REGEX_PLAIN, canonical_pdf_link
+from utils.link_scan import Occurrence, SCAN_EXTENSIONS, find_ids, iter_files, scan_files
+
+# 与utils.arxiv_id中的链接模式一致，ID后紧跟数字时不匹配，避免把过长的ID截断成另一篇论文
+ARXIV_LINK_PATTERN = re.compile(r'https?://(?:www\.|export\.)?arxiv\.org/(?:abs|pdf)/' + ID_REGEX_PLAIN
+                                + r'(?![0-9])')
 
 
 class ArxivLinkProcessor:
@@ -8,7 +17,16 @@ class ArxivLinkProcessor:
         :param markdown_path: Markdown文件路径
         """
         self.markdown_path = markdown_path
-        self.markdown_text = self._read_markdown_file()
+        self._markdown_text = None
+
+    @property
+    def markdown_text(self):
+        """
+        Markdown文本内容，首次访问时读取
+        """
+        if self._markdown_text is None:
+            self._markdown_text = self._read_markdown_file()
+        return self._markdown_text
 
     def _read_markdown_file(self):
         """
@@ -34,8 +52,7 @@ class ArxivLinkProcessor:
         提取Markdown中的所有arXiv链接
         :return: 一个包含arXiv链接的列表
         """
-        arxiv_link_pattern = r'https?://arxiv\.org/(?:abs|pdf)/[0-9]+\.[0-9]+(?:v[0-9]+)?'
-        return re.findall(arxiv_link_pattern, self.markdown_text)
+        return ARXIV_LINK_PATTERN.findall(self.markdown_text)
 
     def convert_to_pdf_links(self, links):
         """
@@ -56,13 +73,122 @@ class ArxivLinkProcessor:
         提取和转换Markdown中的arXiv链接
         :return: 转换为pdf链接的列表
         """
-        # 提取所有的arXiv链接
-        arxiv_links = self.extract_arxiv_links()
+        # 提取所有写法的arXiv ID(链接、镜像、arXiv:前缀、裸ID)
+        arxiv_ids = [arxiv_id.base for arxiv_id in find_ids(self.markdown_text)]
 
-        # 将所有的链接转换为pdf格式
-        converted_links = self.convert_to_pdf_links(arxiv_links)
+        # 同一论文的不同写法(abs/pdf、http/https、不同版本)只保留一个规范链接
+        return self.deduplicate_links(arxiv_ids)
 
-        return converted_links
+    @staticmethod
+    def deduplicate_links(links, index=None):
+        """
+        按基础arXiv ID去重，并转换为规范的pdf链接(不带版本号)
+        :param links: 链接列表
+        :param index: 已登记论文的ArxivIdIndex，为None时新建
+        :return: 去重后的规范链接列表
+        """
+        index = index if index is not None else ArxivIdIndex()
+        return [canonical_pdf_link(link) for link in links if index.add(link)]
+
+    def iter_arxiv_pdf_links(self):
+        """
+        逐行读取Markdown文件并依次产出去重后的规范pdf链接，不把整个文件读入内存
+        除arxiv.org链接外还识别镜像站链接、arXiv:前缀、DOI和裸ID
+        :return: pdf链接的生成器
+        """
+        index = ArxivIdIndex()
+        try:
+            with open(self.markdown_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    for arxiv_id in find_ids(line):
+                        if index.add(arxiv_id.base):
+                            yield canonical_pdf_link(arxiv_id.base)
+        except FileNotFoundError:
+            raise Exception(f"文件 {self.markdown_path} 未找到！")
+
+
+class ArxivLinkScanner:
+    def __init__(self, paths, workers=None, extensions=SCAN_EXTENSIONS, manifest_path=None):
+        """
+        在多个文件或目录树中查找arXiv论文，用多进程并行扫描，并记录每篇论文出现的位置
+        :param paths: 文件或目录路径，或它们的列表
+        :param workers: 工作进程数，为None时使用CPU核数，小于等于1时不启动子进程
+        :param extensions: 目录中需要扫描的扩展名
+        :param manifest_path: 扫描清单路径，记录各文件的指纹和已产出的ID；
+                              指定时只扫描变化的文件(或追加的部分)，且只产出以前没有产出过的论文
+        """
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.workers = workers
+        self.extensions = extensions
+        self.manifest_path = manifest_path
+        self.manifest = self._load_manifest()
+        # 基础ID -> [Occurrence(文件, 行号, 版本号)]，按首次出现的顺序排列，只包含本次扫描到的部分
+        self.sources = {}
+        self._scanned = None
+
+    def _load_manifest(self):
+        """
+        :return: {"files": 文件绝对路径到指纹的字典, "seen": 已产出的基础ID列表}
+        """
+        if self.manifest_path and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        return {"files": {}, "seen": []}
+
+    def save_manifest(self, exclude=()):
+        """
+        保存本次扫描后的清单；应在下游处理完新论文后调用，中途失败时下次仍会重新产出这些论文
+        :param exclude: 下游处理失败的基础ID，不记为已产出，所在文件的指纹也不保存，下次运行重新扫描并产出
+        """
+        if not self.manifest_path or self._scanned is None:
+            return
+        exclude = set(exclude)
+        if exclude:
+            stale = {os.path.abspath(occurrence.path) for base in exclude for occurrence in self.sources.get(base, ())}
+            self._scanned = {"files": {path: fingerprint for path, fingerprint in self._scanned["files"].items()
+                                       if path not in stale},
+                             "seen": [base for base in self._scanned["seen"] if base not in exclude]}
+        self.manifest = self._scanned
+        atomic_write(self.manifest_path,
+                     lambda file: json.dump(self.manifest, file, ensure_ascii=False))
+
+    def iter_arxiv_pdf_links(self):
+        """
+        依次产出去重后的规范pdf链接，每个文件扫描完成后立即产出其中的新论文
+        :return: pdf链接的生成器
+        """
+        self.sources = {}
+        seen = set(self.manifest["seen"])
+        previous = self.manifest["files"] if self.manifest_path else None
+        files_state = {}
+        files = iter_files(self.paths, self.extensions)
+        for path, hits, fingerprint in scan_files(files, self.workers, manifest=previous):
+            files_state[os.path.abspath(path)] = fingerprint
+            for base, version, line in hits:
+                occurrences = self.sources.get(base)
+                if occurrences is None:
+                    occurrences = self.sources[base] = []
+                    if base not in seen:
+                        yield canonical_pdf_link(base)
+                occurrences.append(Occurrence(path, line, version))
+        # 已删除的文件不再保留指纹
+        self._scanned = {"files": files_state,
+                         "seen": self.manifest["seen"] + [base for base in self.sources if base not in seen]}
+
+    def extract_arxiv_pdf_links(self):
+        """
+        :return: 去重后的规范pdf链接列表
+        """
+        return list(self.iter_arxiv_pdf_links())
+
+    def scan(self):
+        """
+        扫描全部文件
+        :return: 基础ID到出现位置列表的字典
+        """
+        for _ in self.iter_arxiv_pdf_links():
+            pass
+        return self.sources
 
 
 # 使用示例
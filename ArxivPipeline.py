@@ -0,0 +1,224 @@
+from ArxivLinker import ArxivLinkProcessor, ArxivLinkScanner
+from ArxivFetcher import AsyncArxivFetcher
+from ArxivReader import ArxivReader
+from ArxivWriter import ArixvWriter
+from utils.arxiv_id import canonical_id
+from utils.metrics import metrics
+from utils.response import get_router
+import os
+import time
+import logging
+import asyncio
+
+
+class ArxivPipeline:
+    def __init__(self, markdown_path, abstracts_path="abstracts.jsonl", summary_path="abstracts_summary.jsonl",
+                 markdown_output="papers.md", csv_output="papers.csv", model="gpt-4o-mini",
+                 queue_size=100, fetch_workers=None, summarize_workers=30, batch_size=50,
+                 merge_calls=False, report_interval=10.0, manifest_path=None, pack_tokens=None,
+                 local_classify=False, near_dup_threshold=None, search_index=None):
+        """
+        从link.md到papers.md的流式流水线
+        链接、摘要和完成的论文分别经过有界队列在各阶段之间流动，队列满时上游阻塞等待(背压)，
+        第一批摘要到达后即开始调用LLM，内存占用与链接总数无关
+        :param markdown_path: 链接所在的Markdown文件，为目录时并行扫描其中的Markdown、HTML、BibTeX和文本文件
+        :param abstracts_path: fetcher的存储文件
+        :param summary_path: reader的存储文件
+        :param markdown_output: 输出的Markdown文件，为None时不渲染
+        :param csv_output: 输出的CSV文件，为None时只渲染Markdown
+        :param model: 使用的模型
+        :param queue_size: 每个队列的容量
+        :param fetch_workers: 获取摘要的并发批次数，默认与fetcher的最大并发数相同(真实arXiv API为1)
+        :param summarize_workers: 同时处理的论文数，实际LLM并发度由utils.response.router中各端点的调度器调节
+        :param batch_size: 每次arXiv API请求打包的ID数量
+        :param merge_calls: 是否用一次调用同时完成总结和分类
+        :param report_interval: 输出队列深度的间隔秒数
+        :param manifest_path: 链接扫描清单路径，指定时只处理上次运行后新出现的论文
+        :param pack_tokens: 打包分类的令牌预算，见ArxivReader
+        :param local_classify: 是否先用本地分类器分类，见ArxivReader
+        :param near_dup_threshold: 近似重复检测的相似度阈值，见ArxivReader
+        :param search_index: 全文索引文件路径，见ArxivReader
+        """
+        if manifest_path or os.path.isdir(markdown_path):
+            self.linker = ArxivLinkScanner(markdown_path, manifest_path=manifest_path)
+        else:
+            self.linker = ArxivLinkProcessor(markdown_path)
+        self.fetcher = AsyncArxivFetcher([], abstracts_path, batch_size=batch_size,
+                                         max_concurrency=fetch_workers)
+        fetch_workers = fetch_workers or self.fetcher.max_concurrency
+        self.reader = ArxivReader(None, summary_path, model=model, merge_calls=merge_calls,
+                                  pack_tokens=pack_tokens, local_classify=local_classify,
+                                  near_dup_threshold=near_dup_threshold, search_index=search_index)
+        self.summary_path = summary_path
+        self.markdown_output = markdown_output
+        self.csv_output = csv_output
+        self.queue_size = queue_size
+        self.fetch_workers = fetch_workers
+        self.summarize_workers = summarize_workers
+        self.batch_size = batch_size
+        self.report_interval = report_interval
+        self.counters = {"links": 0, "fetched": 0, "summarized": 0, "written": 0, "failed": 0}
+        # 获取或总结失败的基础ID，不写入扫描清单，下次运行重新产出
+        self.failed_ids = set()
+        self._queues = {}
+
+    def stats(self):
+        """
+        :return: 各阶段队列深度和计数
+        """
+        depths = {f"{name}_queue": queue.qsize() for name, queue in self._queues.items()}
+        return {**depths, **self.counters}
+
+    async def _produce_links(self, links):
+        """
+        逐个产出链接，linker已按基础ID去重，同一论文只下发一次
+        """
+        for link in self.linker.iter_arxiv_pdf_links():
+            if not self._usable():
+                # 没有可用的LLM端点，不再产出链接，下游处理完在途的条目后结束
+                break
+            self.counters["links"] += 1
+            await links.put(link)
+        for _ in range(self.fetch_workers):
+            await links.put(None)
+
+    async def _next_batch(self, links):
+        """
+        取出一批链接：至少等待一个，随后只取队列中已有的，避免为凑满批次推迟首批请求
+        :return: (链接列表, 是否已收到结束标记)
+        """
+        link = await links.get()
+        if link is None:
+            return [], True
+        batch = [link]
+        while len(batch) < self.batch_size:
+            try:
+                link = links.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if link is None:
+                return batch, True
+            batch.append(link)
+        return batch, False
+
+    async def _fetch(self, links, records, client, limiter, sem):
+        """
+        获取摘要并下发到总结阶段，已获取过的链接直接复用存储中的记录
+        """
+        done = False
+        while not done:
+            batch, done = await self._next_batch(links)
+            pending = []
+            for link in batch:
+                existing = self.fetcher.find_processed(link)
+                if existing is not None:
+                    await records.put((existing, self.fetcher.processed_data[existing]))
+                    continue
+                arxiv_id = self.fetcher._extract_arxiv_id(link)
+                if arxiv_id:
+                    pending.append((link, arxiv_id))
+                else:
+                    logging.warning(f"无效的arXiv链接: {link}")
+            if pending:
+                for link, abstract in await self.fetcher._fetch_batch_async(client, limiter, sem, pending):
+                    self.counters["fetched"] += 1
+                    await records.put((link, abstract))
+
+    async def _summarize(self, records, papers):
+        while True:
+            item = await records.get()
+            if item is None:
+                return
+            key, entry = item
+            if "error" in entry or not self._usable():
+                self._fail(key)
+                continue
+            key, processed_entry = await self.reader._process_entry(key, entry)
+            if processed_entry is None:
+                self._fail(key)
+                continue
+            self.counters["summarized"] += 1
+            await papers.put((key, processed_entry))
+
+    def _usable(self):
+        return get_router().usable(self.reader.model)
+
+    def _fail(self, key):
+        self.counters["failed"] += 1
+        base = canonical_id(key)
+        if base:
+            self.failed_ids.add(base)
+
+    async def _collect(self, papers):
+        """
+        写出阶段：论文已由reader写入存储，这里只计数并在结束时渲染输出
+        """
+        while True:
+            item = await papers.get()
+            if item is None:
+                return
+            self.counters["written"] += 1
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logging.info(f"Pipeline: {self.stats()}")
+
+    async def run(self):
+        """
+        运行整条流水线直到所有链接处理完毕
+        """
+        start = time.monotonic()
+        links = asyncio.Queue(self.queue_size)
+        records = asyncio.Queue(self.queue_size)
+        papers = asyncio.Queue(self.queue_size)
+        self._queues = {"links": links, "records": records, "papers": papers}
+
+        with metrics.stage("pipeline"):
+            reporter = asyncio.create_task(self._report())
+            limiter, sem = self.fetcher.make_limiters()
+            try:
+                async with self.fetcher.make_client() as client:
+                    producer = asyncio.create_task(self._produce_links(links))
+                    fetchers = [asyncio.create_task(self._fetch(links, records, client, limiter, sem))
+                                for _ in range(self.fetch_workers)]
+                    summarizers = [asyncio.create_task(self._summarize(records, papers))
+                                   for _ in range(self.summarize_workers)]
+                    collector = asyncio.create_task(self._collect(papers))
+
+                    # 逐级关闭：上游全部结束后向下游发送结束标记
+                    await asyncio.gather(producer, *fetchers)
+                    for _ in summarizers:
+                        await records.put(None)
+                    await asyncio.gather(*summarizers)
+                    await papers.put(None)
+                    await collector
+            finally:
+                reporter.cancel()
+                self.fetcher.close()
+                self.reader.close()
+
+        if isinstance(self.linker, ArxivLinkScanner):
+            self.linker.save_manifest(exclude=self.failed_ids)
+        if not self._usable():
+            logging.error(f"No usable endpoint for {self.reader.model} (quota exhausted), pipeline stopped early; "
+                          f"rerun to resume.")
+        self.render()
+        logging.info(f"Pipeline finished in {time.monotonic() - start:.1f}s: {self.stats()}")
+        report = metrics.report()
+        if report:
+            logging.info("Metrics:\n" + report)
+
+    def render(self):
+        """
+        根据reader的存储增量更新Markdown和CSV，只渲染新完成的论文
+        """
+        if not self.markdown_output:
+            return
+        ArixvWriter(self.summary_path).save_incremental(self.markdown_output, self.csv_output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    pipeline = ArxivPipeline("link.md")
+    asyncio.run(pipeline.run())
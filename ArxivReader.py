@@ -1,44 +1,108 @@
-from utils.response import responser, extract_content
+from utils.response import (responser, cached_responser, extract_content, get_client, get_config,
+                            get_response_cache, get_router)
 from utils import logs
-from prompts import SUMMARY_PROMPT, CLASSIFY_PROMPT
+from utils.packing import RequestPacker
+from utils.scheduler import estimate_tokens
+from utils.metrics import metrics
+from prompts import (SUMMARY_PROMPT, CLASSIFY_PROMPT, COMBINED_PROMPT, PACKED_CLASSIFY_PROMPT,
+                     CLASSIFY_METHODS, CLASSIFY_TYPES)
+import re
+from utils.storage import open_storage, atomic_write
+from utils.arxiv_id import ArxivIdIndex, canonical_id
+import os
 import json
+import time
 import logging
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+
+# 批处理请求使用与responser一致的参数，保证结果可以与实时调用共用缓存
+BATCH_TEMPERATURE = 0.3
+BATCH_MAX_TOKENS = 4096
+BATCH_ENDPOINT = "/v1/chat/completions"
+# 打包分类时每篇论文预留的输出令牌数
+PACKED_OUTPUT_TOKENS = 30
+PACKED_RESULT_PATTERN = re.compile(r'<paper id="?(\d+)"?>(.*?)</paper>', re.DOTALL)
 
 
 class ArxivReader:
-    def __init__(self, input_file, output_file, model="gpt-4o-mini"):
+    def __init__(self, input_file, output_file, model="gpt-4o-mini", flush_every=20, flush_interval=30.0,
+                 merge_calls=False, pack_tokens=None, local_classify=False, near_dup_threshold=None,
+                 search_index=None):
+        """
+        :param input_file: fetcher的存储文件，按扩展名选择JSON、JSONL或SQLite后端；
+                           为None时不加载输入，由调用方(如流水线)直接提交条目
+        :param output_file: 总结结果的存储文件
+        :param model: 使用的模型
+        :param flush_every: 累计多少条结果后批量落盘
+        :param flush_interval: 距上次落盘超过多少秒后自动落盘
+        :param merge_calls: 是否用一次调用同时完成总结和分类，解析失败时回退到两次调用
+        :param pack_tokens: 打包分类的令牌预算，指定时把多篇论文打包进一次分类请求，
+                            分摊分类提示词的开销；优先于merge_calls
+        :param local_classify: 是否先用已分类论文训练的本地分类器分类，只把没有把握的论文交给LLM分类，
+                               参数见config.yaml的local_classifier段
+        :param near_dup_threshold: 近似重复检测的Jaccard相似度阈值，指定时标题和摘要与已有论文近似重复的论文
+                                   不再总结，其链接作为备用链接并入代表论文的alternates字段
+        :param search_index: 全文索引文件路径，指定时每保存一条结果就更新索引，见utils.search
+        """
         self.input_file = input_file
         self.output_file = output_file
         self.model = model
-        self.data = self._load_json(input_file)
-        self.output_data = self._load_json(output_file, default={})
+        self.merge_calls = merge_calls
+        self.packer = None
+        if pack_tokens:
+            overhead = estimate_tokens([{"role": "user", "content": PACKED_CLASSIFY_PROMPT}])
+            self.packer = RequestPacker(self._classify_pack, pack_tokens, overhead=overhead)
+        self.data = open_storage(input_file, table="abstracts") if input_file else {}
+        self.output_data = open_storage(output_file, table="summaries",
+                                        flush_every=flush_every, flush_interval=flush_interval)
+        # 已总结论文的基础ID索引，同一论文的不同链接只调用一次LLM
+        self.output_index = ArxivIdIndex(self.output_data.keys())
+        self.local_classifier = None
+        if local_classify:
+            # 按需导入，未启用时不依赖NumPy
+            from utils.local_classifier import LocalClassifier
+            self.local_classifier = LocalClassifier.from_config(get_config().get('local_classifier')).fit(
+                self._training_papers(), self._abstract_text, CLASSIFY_METHODS, CLASSIFY_TYPES)
+            logging.info(f"Local classifier trained on {self.local_classifier.trained} papers.")
+        self.search_index = None
+        if search_index:
+            from utils.search import SearchIndex
+            self.search_index = SearchIndex(search_index)
+        self.near_dups = None
+        # 代表论文仍在处理中时先记下它的近似重复论文，代表论文保存后再一起写入
+        self._pending_alternates = {}
+        if near_dup_threshold:
+            from utils.near_dup import NearDuplicateIndex
+            self.near_dups = NearDuplicateIndex(threshold=near_dup_threshold)
+            for key, entry in self.output_data.items():
+                if isinstance(entry, dict) and not entry.get("duplicate_of"):
+                    self.near_dups.add(key, self._abstract_text(entry))
         self.total_entries = len(self.data)
         # 添加锁以确保文件写入的线程安全
         self._file_lock = asyncio.Lock()
 
-    @staticmethod
-    def _load_json(file_path, default=None):
-        try:
-            with open(file_path, "r", encoding='utf-8') as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return default if default is not None else {}
-
     async def _save_entry(self, key, entry):
         """
-        保存单个条目到输出文件
+        保存单个条目到输出存储，由存储后端按批次落盘
         :param key: 条目键
         :param entry: 条目内容
         """
         async with self._file_lock:
-            self.output_data[key] = entry  # 更新内存中的数据
-            # 直接写入全部数据
-            with open(self.output_file, "w", encoding='utf-8') as file:
-                json.dump(self.output_data, file, indent=4, ensure_ascii=False)
+            self.output_data.put(key, entry)
+            if self.search_index is not None:
+                self.search_index.add(key, entry)
             logging.info(f"Entry {key} saved successfully.")
 
+    def close(self):
+        """
+        落盘剩余结果并释放存储后端
+        """
+        self.output_data.close()
+        if self.input_file:
+            self.data.close()
+        if self.search_index is not None:
+            self.search_index.close()
+
     async def _process_entry(self, key, entry):
         """
         处理单个条目
@@ -50,53 +114,486 @@ class ArxivReader:
             logging.info(f"Skipping {key}, already exists in output.")
             return key, self.output_data[key]
 
+        # 同一论文可能以不同的链接写法出现，按基础ID判重
+        existing = self.output_index.get(self._paper_ref(key, entry))
+        if existing is not None:
+            if existing in self.output_data:
+                logging.info(f"Skipping {key}, same paper as {existing}.")
+                return key, self.output_data[existing]
+            logging.info(f"Skipping {key}, same paper as {existing} which is in progress.")
+            return key, None
+        self.output_index.add(key, canonical_id(self._paper_ref(key, entry)))
+
+        start = time.perf_counter()
         try:
-            title = entry.get("title", "No title provided")
-            abstract = entry.get("abstract", "No abstract provided")
-            abstract_text = f"Title: {title}\nAbstract: {abstract}\n"
-            summary_prompt = abstract_text + SUMMARY_PROMPT
-            classify_prompt = abstract_text + CLASSIFY_PROMPT
-
-            # 异步调用 LLM
-            summary = await responser([{"role": "user", "content": summary_prompt}], self.model)
-            classification = await responser([{"role": "user", "content": classify_prompt}], self.model)
-
-            # 提取分类信息
-            classify_type = extract_content(classification, "type")
-            classify_method = extract_content(classification, "method")
-
-            # 更新条目信息
-            processed_entry = entry.copy()
-            processed_entry.update({
-                "summary": summary,
-                "type": classify_type,
-                "method": classify_method
-            })
+            abstract_text = self._abstract_text(entry)
+            representative = self.near_dups.add(key, abstract_text) if self.near_dups is not None else None
+            if representative is not None:
+                return await self._record_duplicate(key, entry, representative)
+
+            labels = self.local_classifier.classify([abstract_text])[0] if self.local_classifier else None
+
+            if labels is not None:
+                result = await self._summarize_with_labels(abstract_text, labels)
+            elif self.packer is not None:
+                result = await self._summarize_then_classify_packed(abstract_text)
+            else:
+                result = await self._summarize_and_classify(abstract_text) if self.merge_calls else None
+            if result is None:
+                result = await self._summarize_then_classify(abstract_text)
 
             # 立即保存这个条目
+            processed_entry = self._build_entry(entry, result)
+            if labels is not None:
+                processed_entry["classified_by"] = "local"
             await self._save_entry(key, processed_entry)
+            duplicates = self._pending_alternates.pop(key, None)
+            if duplicates:
+                processed_entry = await self._add_alternates(key, duplicates)
+            metrics.observe("reader.paper", time.perf_counter() - start)
             return key, processed_entry
 
         except Exception as e:
             logging.error(f"Error processing entry {key}: {e}")
+            metrics.count("reader.failed")
+            self.output_index.discard(self._paper_ref(key, entry))
+            if self.near_dups is not None:
+                # 失败的论文移出近似重复索引，以它为代表的簇改由其他论文代表
+                representative = self.near_dups.remove(key)
+                duplicates = self._pending_alternates.pop(key, None)
+                if duplicates:
+                    await self._promote(representative, duplicates)
             return key, None
 
+    async def _promote(self, representative, duplicates):
+        """
+        代表论文失败后处理等待并入它的近似重复论文
+        :param representative: 簇的新代表键
+        :param duplicates: (键, 占位记录, 条目)列表
+        """
+        if representative in self.output_data:
+            await self._add_alternates(representative, duplicates)
+            return
+        keys = [key for key, _, _ in duplicates]
+        if representative is not None and representative not in keys:
+            # 新代表仍在处理中，保存后再一起并入
+            self._pending_alternates.setdefault(representative, []).extend(duplicates)
+            return
+        index = keys.index(representative) if representative is not None else 0
+        key, _, entry = duplicates.pop(index)
+        if duplicates:
+            self._pending_alternates.setdefault(key, []).extend(duplicates)
+        logging.info(f"Promoting near-duplicate {key} to representative.")
+        self.output_index.discard(self._paper_ref(key, entry))
+        await self._process_entry(key, entry)
+
+    async def _record_duplicate(self, key, entry, representative):
+        """
+        记录近似重复论文：保存指向代表论文的占位记录，并把链接加入代表论文的备用链接
+        :param representative: 代表论文的键
+        :return: (键, 代表论文的记录)，代表论文仍在处理中时为(键, None)
+        """
+        stub = {"duplicate_of": representative, "id": entry.get("id"), "title": entry.get("title"),
+                "link": entry.get("link") or key, "published": entry.get("published")}
+        if representative in self.output_data:
+            logging.info(f"Skipping {key}, near-duplicate of {representative}.")
+            return key, await self._add_alternates(representative, [(key, stub, entry)])
+        logging.info(f"Skipping {key}, near-duplicate of {representative} which is in progress.")
+        self._pending_alternates.setdefault(representative, []).append((key, stub, entry))
+        return key, None
+
+    async def _add_alternates(self, representative, duplicates):
+        """
+        把近似重复论文的链接并入代表论文，并保存它们的占位记录
+        :param duplicates: (键, 占位记录, 条目)列表
+        :return: 更新后的代表论文记录
+        """
+        async with self._file_lock:
+            entry = dict(self.output_data[representative])
+            alternates = list(entry.get("alternates") or [])
+            for key, stub, _ in duplicates:
+                if stub["link"] not in alternates:
+                    alternates.append(stub["link"])
+                # 原代表论文失败后改由其他论文代表时，占位记录指向新的代表
+                self.output_data.put(key, dict(stub, duplicate_of=representative))
+            entry["alternates"] = alternates
+            self.output_data.put(representative, entry)
+            if self.search_index is not None:
+                self.search_index.add(representative, entry)
+        return entry
+
+    @staticmethod
+    def _paper_ref(key, entry):
+        """
+        :return: 能解析出arXiv ID的引用，键本身不是链接时使用条目中的id字段
+        """
+        return key if canonical_id(key) else entry.get("id")
+
+    @staticmethod
+    def _abstract_text(entry):
+        title = entry.get("title", "No title provided")
+        abstract = entry.get("abstract", "No abstract provided")
+        return f"Title: {title}\nAbstract: {abstract}\n"
+
+    @staticmethod
+    def _build_entry(entry, result):
+        """
+        将总结和分类结果合并到条目
+        :param result: (summary, type, method)
+        """
+        summary, classify_type, classify_method = result
+        processed_entry = entry.copy()
+        processed_entry.update({
+            "summary": summary,
+            "type": classify_type,
+            "method": classify_method
+        })
+        return processed_entry
+
+    @staticmethod
+    def _parse_combined(response):
+        """
+        解析合并调用的响应
+        :return: (summary, type, method)，缺少任一标签时返回None
+        """
+        if not response:
+            return None
+        result = tuple(extract_content(response, tag) for tag in ("summary", "type", "method"))
+        return result if all(result) else None
+
+    async def _summarize_then_classify(self, abstract_text):
+        """
+        分别调用总结和分类
+        :return: (summary, type, method)
+        """
+        summary_prompt = abstract_text + SUMMARY_PROMPT
+        classify_prompt = abstract_text + CLASSIFY_PROMPT
+
+        # 异步调用 LLM
+        summary = await cached_responser([{"role": "user", "content": summary_prompt}], self.model)
+        classification = await cached_responser([{"role": "user", "content": classify_prompt}], self.model)
+
+        # 提取分类信息
+        classify_type = extract_content(classification, "type")
+        classify_method = extract_content(classification, "method")
+        return summary, classify_type, classify_method
+
+    async def _summarize_with_labels(self, abstract_text, labels):
+        """
+        本地分类已有把握时只调用总结
+        :param labels: 本地分类给出的(type, method)
+        :return: (summary, type, method)
+        """
+        summary = await cached_responser([{"role": "user", "content": abstract_text + SUMMARY_PROMPT}], self.model)
+        return (summary, *labels)
+
+    async def _summarize_then_classify_packed(self, abstract_text):
+        """
+        单独调用总结，分类与其他论文打包进同一请求，两者并发进行
+        :return: (summary, type, method)
+        """
+        summary_prompt = abstract_text + SUMMARY_PROMPT
+        summary, (classify_type, classify_method) = await asyncio.gather(
+            cached_responser([{"role": "user", "content": summary_prompt}], self.model),
+            self._classify_packed(abstract_text))
+        return summary, classify_type, classify_method
+
+    @staticmethod
+    def _packed_cache_messages(abstract_text):
+        # 打包请求的响应含多篇论文，按单篇论文的虚拟请求缓存结果，重跑时不受打包组合的影响
+        return [{"role": "user", "content": abstract_text + PACKED_CLASSIFY_PROMPT}]
+
+    async def _classify_packed(self, abstract_text):
+        """
+        :return: (type, method)
+        """
+        cached = self._cached(self._packed_cache_messages(abstract_text))
+        if cached is not None:
+            return extract_content(cached, "type"), extract_content(cached, "method")
+        tokens = estimate_tokens([{"role": "user", "content": abstract_text}]) + PACKED_OUTPUT_TOKENS
+        return await self.packer.submit(abstract_text, tokens)
+
+    def _training_papers(self):
+        """
+        本地分类器的训练样本：由LLM分类的论文，标签按_normalize_label规范化；
+        本地分类器自己给出标签的论文不参与训练，避免用自己的猜测训练自己
+        :return: 论文记录的生成器
+        """
+        for _, entry in self.output_data.items():
+            if not isinstance(entry, dict) or entry.get("duplicate_of") or entry.get("classified_by") == "local":
+                continue
+            yield dict(entry, method=self._normalize_label(entry.get("method"), CLASSIFY_METHODS),
+                       type=self._normalize_label(entry.get("type"), CLASSIFY_TYPES))
+
+    @staticmethod
+    def _normalize_label(value, allowed):
+        """
+        :return: 规范化后的标签，不在合法取值中时返回None
+        """
+        if not value:
+            return None
+        value = value.strip().strip("[]").strip().lower().replace("-", "_").replace(" ", "_")
+        return value if value in allowed else None
+
+    def _parse_packed(self, response, count):
+        """
+        按编号解析打包分类的响应
+        :param count: 包中的论文数
+        :return: 与论文一一对应的(type, method)列表，缺失或标签不合法的论文为None
+        """
+        results = [None] * count
+        for paper_id, body in PACKED_RESULT_PATTERN.findall(response or ""):
+            index = int(paper_id) - 1
+            if not 0 <= index < count:
+                continue
+            classify_type = self._normalize_label(extract_content(body, "type"), CLASSIFY_TYPES)
+            classify_method = self._normalize_label(extract_content(body, "method"), CLASSIFY_METHODS)
+            if classify_type and classify_method:
+                results[index] = (classify_type, classify_method)
+        return results
+
+    async def _classify_pack(self, abstract_texts, retry=True):
+        """
+        用一次请求分类一包论文；模型遗漏或给出非法标签的论文重新打包再试一次，仍失败的逐篇单独分类
+        :param abstract_texts: 论文的标题和摘要列表
+        :param retry: 是否重新打包遗漏的论文
+        :return: 与输入一一对应的(type, method)列表
+        """
+        content = "".join(f'<paper id="{index}">\n{text}</paper>\n'
+                          for index, text in enumerate(abstract_texts, 1))
+        response = await responser([{"role": "user", "content": content + PACKED_CLASSIFY_PROMPT}], self.model)
+        results = self._parse_packed(response, len(abstract_texts))
+
+        response_cache = get_response_cache()
+        for text, result in zip(abstract_texts, results):
+            if result is not None and response_cache is not None:
+                classify_type, classify_method = result
+                response_cache.put(
+                    response_cache.make_key(self.model, BATCH_TEMPERATURE, self._packed_cache_messages(text)),
+                    f"<method>{classify_method}</method>\n<type>{classify_type}</type>")
+
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        logging.warning(f"Packed classification missed {len(missing)}/{len(abstract_texts)} papers, reassigning.")
+        if retry and len(missing) < len(abstract_texts):
+            retried = await self._classify_pack([abstract_texts[index] for index in missing], retry=False)
+            for index, result in zip(missing, retried):
+                results[index] = result
+        else:
+            classifications = await asyncio.gather(*(
+                cached_responser([{"role": "user", "content": abstract_texts[index] + CLASSIFY_PROMPT}], self.model)
+                for index in missing))
+            for index, classification in zip(missing, classifications):
+                results[index] = (extract_content(classification or "", "type"),
+                                  extract_content(classification or "", "method"))
+        return results
+
+    async def _summarize_and_classify(self, abstract_text):
+        """
+        一次调用同时完成总结和分类
+        :return: (summary, type, method)，响应缺少任一标签时返回None
+        """
+        response = await cached_responser([{"role": "user", "content": abstract_text + COMBINED_PROMPT}],
+                                          self.model)
+        result = self._parse_combined(response)
+        if response and result is None:
+            logging.warning("Combined response could not be parsed, falling back to separate calls.")
+        return result
+
     async def summarize_all(self):
-        sem = asyncio.Semaphore(30)  # 限制并发数量为10
+        # 实际的LLM并发度由各端点的scheduler按限流反馈自适应调节，这里只限制同时处理的条目数
+        router = get_router()
+        sem = asyncio.Semaphore(router.capacity())
 
         async def bounded_process(key, entry):
             async with sem:  # 使用信号量控制并发
+                if not router.usable(self.model):
+                    # 所有端点都已停用，剩余条目留待下次运行
+                    return key, None
                 return await self._process_entry(key, entry)
 
         tasks = [bounded_process(key, entry)
                  for key, entry in self.data.items()]
 
         completed = 0
-        for task in asyncio.as_completed(tasks):
-            key, processed_entry = await task
-            if processed_entry:
-                completed += 1
-                logging.info(f"Progress: {completed}/{self.total_entries}")
+        with metrics.stage("summarize"):
+            for task in asyncio.as_completed(tasks):
+                key, processed_entry = await task
+                if processed_entry:
+                    completed += 1
+                    logging.info(f"Progress: {completed}/{self.total_entries}")
+            self.output_data.flush()
+        if not router.usable(self.model):
+            logging.error(f"No usable endpoint for {self.model} (quota exhausted), stopped with "
+                          f"{self.total_entries - completed} entries left; rerun to resume.")
+        response_cache = get_response_cache()
+        if response_cache is not None:
+            logging.info(f"Response cache: {response_cache.stats()}")
+        if self.packer is not None:
+            logging.info(f"Packed classification: {self.packer.stats()}")
+        if self.local_classifier is not None:
+            logging.info(f"Local classifier: {self.local_classifier.stats()}")
+        if len(router.endpoints) > 1:
+            logging.info(f"Router: {router.stats()}")
+
+    def _batch_prompts(self, entry):
+        """
+        生成单个条目需要的批处理请求
+        :return: {请求类型: messages}
+        """
+        abstract_text = self._abstract_text(entry)
+        if self.merge_calls:
+            prompts = {"combined": COMBINED_PROMPT}
+        else:
+            prompts = {"summary": SUMMARY_PROMPT, "classify": CLASSIFY_PROMPT}
+        return {kind: [{"role": "user", "content": abstract_text + prompt}] for kind, prompt in prompts.items()}
+
+    def _cached(self, messages):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return None
+        return response_cache.get(response_cache.make_key(self.model, BATCH_TEMPERATURE, messages))
+
+    def _write_batch_input(self, pending, batch_input):
+        """
+        将所有待处理条目中缓存未命中的请求写入批处理输入文件
+        custom_id格式为 "<请求类型>::<条目键>"
+        :return: 写入的请求数
+        """
+        count = 0
+        with open(batch_input, "w", encoding="utf-8") as file:
+            for key, entry in pending.items():
+                for kind, messages in self._batch_prompts(entry).items():
+                    if self._cached(messages) is not None:
+                        continue
+                    file.write(json.dumps({
+                        "custom_id": f"{kind}::{key}",
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": {
+                            "model": self.model,
+                            "temperature": BATCH_TEMPERATURE,
+                            "max_tokens": BATCH_MAX_TOKENS,
+                            "messages": messages
+                        }
+                    }, ensure_ascii=False) + "\n")
+                    count += 1
+        return count
+
+    async def _wait_for_batch(self, batch_id, poll_interval):
+        """
+        轮询批处理任务直到结束
+        :return: 最终的batch对象
+        """
+        while True:
+            batch = await get_client().batches.retrieve(batch_id)
+            counts = batch.request_counts
+            logging.info(f"Batch {batch_id}: {batch.status}"
+                         + (f" ({counts.completed}/{counts.total})" if counts else ""))
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                return batch
+            await asyncio.sleep(poll_interval)
+
+    async def _download_batch_results(self, batch, pending):
+        """
+        下载批处理输出，按custom_id返回响应文本并写入响应缓存
+        :return: {custom_id: 响应文本}
+        """
+        results = {}
+        if batch.error_file_id:
+            errors = (await get_client().files.content(batch.error_file_id)).text.splitlines()
+            logging.warning(f"Batch {batch.id}: {len(errors)} requests failed, they stay pending for the next run.")
+        if not batch.output_file_id:
+            return results
+
+        content = (await get_client().files.content(batch.output_file_id)).text
+        response_cache = get_response_cache()
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                continue
+            custom_id = item["custom_id"]
+            results[custom_id] = response["body"]["choices"][0]["message"]["content"]
+
+            kind, key = custom_id.split("::", 1)
+            if response_cache is not None and key in pending:
+                messages = self._batch_prompts(pending[key])[kind]
+                response_cache.put(response_cache.make_key(self.model, BATCH_TEMPERATURE, messages),
+                                   results[custom_id])
+        return results
+
+    async def summarize_batch(self, batch_input="batch_input.jsonl", poll_interval=30.0):
+        """
+        使用OpenAI Batch API离线处理所有待处理条目，见_summarize_batch
+        """
+        with metrics.stage("summarize.batch"):
+            await self._summarize_batch(batch_input, poll_interval)
+
+    async def _summarize_batch(self, batch_input, poll_interval):
+        """
+        使用OpenAI Batch API离线处理所有待处理条目
+        提交后批处理ID记录在 <output_file>.batch.json 中，中断后重新运行会继续等待同一个批处理，
+        结果写入输出存储后删除该文件；失败的请求保持待处理状态，下次运行时重新提交
+        :param batch_input: 批处理输入JSONL文件路径
+        :param poll_interval: 轮询间隔秒数
+        """
+        state_path = f"{self.output_file}.batch.json"
+        pending = {}
+        for key, entry in self.data.items():
+            ref = self._paper_ref(key, entry)
+            if key in self.output_data or ref in self.output_index:
+                continue
+            pending[key] = entry
+            self.output_index.add(key, canonical_id(ref))
+        logging.info(f"Batch mode: {len(pending)}/{self.total_entries} entries pending.")
+
+        results = {}
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as file:
+                batch_id = json.load(file)["batch_id"]
+            logging.info(f"Resuming batch {batch_id}.")
+        elif self._write_batch_input(pending, batch_input):
+            with open(batch_input, "rb") as file:
+                input_file = await get_client().files.create(file=file, purpose="batch")
+            batch = await get_client().batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+                                                completion_window="24h")
+            batch_id = batch.id
+            state = {"batch_id": batch_id, "input_file_id": input_file.id}
+            atomic_write(state_path, lambda file: json.dump(state, file))
+            logging.info(f"Submitted batch {batch_id}.")
+        else:
+            batch_id = None
+
+        if batch_id:
+            batch = await self._wait_for_batch(batch_id, poll_interval)
+            results = await self._download_batch_results(batch, pending)
+
+        completed = 0
+        for key, entry in pending.items():
+            responses = {kind: results.get(f"{kind}::{key}") or self._cached(messages)
+                         for kind, messages in self._batch_prompts(entry).items()}
+            if self.merge_calls:
+                result = self._parse_combined(responses["combined"])
+            elif responses["summary"] and responses["classify"]:
+                result = (responses["summary"],
+                          extract_content(responses["classify"], "type"),
+                          extract_content(responses["classify"], "method"))
+            else:
+                result = None
+            if result is None:
+                logging.warning(f"No usable batch result for {key}, it stays pending.")
+                continue
+            await self._save_entry(key, self._build_entry(entry, result))
+            completed += 1
+
+        self.output_data.flush()
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        logging.info(f"Batch mode: {completed}/{len(pending)} entries completed.")
 
 
 if __name__ == "__main__":
@@ -105,4 +602,5 @@ if __name__ == "__main__":
     output_file = "abstracts_summary.json"
 
     reader = ArxivReader(input_file, output_file)
-    asyncio.run(reader.summarize_all())
\ No newline at end of file
+    asyncio.run(reader.summarize_all())
+    reader.close()
\ No newline at end of file
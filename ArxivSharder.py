@@ -0,0 +1,229 @@
+from ArxivReader import ArxivReader
+from utils.arxiv_id import ArxivIdIndex
+from utils.response import get_endpoints, use_endpoint
+from utils.sharding import Lease, shard_of
+from utils.storage import open_storage, atomic_write
+import os
+import json
+import time
+import shutil
+import logging
+import asyncio
+import contextlib
+import multiprocessing
+
+
+def _work(options, worker):
+    # 子进程入口，参数需可序列化，因此在子进程中重新构建分片器
+    ArxivSharder(**options).work(worker)
+
+
+class ArxivSharder:
+    def __init__(self, input_file, output_file, shards=None, shard_dir=None, lease_ttl=60.0, search_index=None,
+                 **reader_options):
+        """
+        多进程、多机器分片总结
+        待处理条目按基础arXiv ID的哈希分成shards个分片，每个分片有自己的输入和输出文件；
+        工作进程各自使用config.yaml的endpoints段中的一个端点(API密钥)，通过租约文件认领分片，
+        崩溃的工作进程的租约过期后由其他工作进程接管并从已有输出继续；全部分片完成后按输入顺序合并
+        分片在 <shard_dir> 下的文件：plan.json(分片计划)、shard-NN.input.jsonl、shard-NN.jsonl(输出)、shard-NN.lease
+        近似重复检测和本地分类器只在分片内生效
+        :param input_file: fetcher的存储文件
+        :param output_file: 合并后的总结结果存储文件
+        :param shards: 分片数，默认等于端点数
+        :param shard_dir: 分片目录，默认为 <output_file>.shards，多台机器运行时需位于共享文件系统
+        :param lease_ttl: 租约有效秒数，工作进程停止续约超过该时间后分片可被接管
+        :param search_index: 全文索引文件路径，指定时合并后用合并的结果更新索引
+        :param reader_options: 传给ArxivReader的其他参数，如model、merge_calls、pack_tokens
+        """
+        self.input_file = input_file
+        self.output_file = output_file
+        self.shards = shards
+        self.shard_dir = shard_dir or f"{output_file}.shards"
+        self.lease_ttl = lease_ttl
+        self.search_index = search_index
+        self.reader_options = reader_options
+
+    def _options(self):
+        return {"input_file": self.input_file, "output_file": self.output_file, "shards": self.shards,
+                "shard_dir": self.shard_dir, "lease_ttl": self.lease_ttl, **self.reader_options}
+
+    def _path(self, shard, suffix):
+        return os.path.join(self.shard_dir, f"shard-{shard:02d}.{suffix}")
+
+    def _load_plan(self):
+        try:
+            with open(os.path.join(self.shard_dir, "plan.json"), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def plan(self):
+        """
+        把输出中还没有的条目按哈希写入各分片的输入文件；分片计划已存在时直接沿用，以便中断后继续
+        :return: 分片计划
+        """
+        plan = self._load_plan()
+        if plan is not None:
+            if self.shards is not None and plan["shards"] != self.shards:
+                raise ValueError(f"{self.shard_dir} was planned with {plan['shards']} shards, "
+                                 f"merge or remove it before using {self.shards}")
+            self.shards = plan["shards"]
+            return plan
+
+        if self.shards is None:
+            self.shards = len(get_endpoints())
+        os.makedirs(self.shard_dir, exist_ok=True)
+        with open_storage(self.output_file, table="summaries") as output:
+            done = ArxivIdIndex(output.keys())
+        inputs = []
+        for shard in range(self.shards):
+            path = self._path(shard, "input.jsonl")
+            if os.path.exists(path):
+                # 上次分片写到一半中断
+                os.remove(path)
+            inputs.append(open_storage(path, flush_every=1000))
+        with open_storage(self.input_file, table="abstracts") as data:
+            for key, entry in data.items():
+                if done.get(key) is None:
+                    inputs[shard_of(key, self.shards, entry)][key] = entry
+        for storage in inputs:
+            storage.close()
+
+        plan = {"input_file": self.input_file, "output_file": self.output_file, "shards": self.shards,
+                "entries": [len(storage) for storage in inputs], "created": time.time()}
+        atomic_write(os.path.join(self.shard_dir, "plan.json"), lambda file: json.dump(plan, file))
+        logging.info(f"Planned {sum(plan['entries'])} entries into {self.shards} shards: {plan['entries']}")
+        return plan
+
+    def work(self, worker):
+        """
+        工作进程入口：使用第worker个端点，从第worker个分片开始依次认领未完成的分片并总结，
+        没有可认领的分片时返回；需先调用plan，其他机器上可通过 python cli.py shard work --worker N 启动
+        :param worker: 工作进程编号
+        :return: 本进程完成的分片编号列表
+        """
+        plan = self._load_plan()
+        if plan is None:
+            raise RuntimeError(f"No shard plan in {self.shard_dir}, run plan first")
+        use_endpoint(worker)
+        finished = []
+        for offset in range(plan["shards"]):
+            shard = (worker + offset) % plan["shards"]
+            lease = Lease(self._path(shard, "lease"), ttl=self.lease_ttl)
+            if not lease.acquire():
+                continue
+            logging.info(f"Worker {worker} summarizing shard {shard}")
+            try:
+                summarized, failed = self._summarize_shard(shard, lease)
+            except BaseException:
+                lease.release()
+                raise
+            if lease.lost:
+                # 租约已被其他工作进程接管，由接管者完成该分片
+                logging.warning(f"Worker {worker} lost the lease of shard {shard}, stopped summarizing it.")
+                lease.release()
+                continue
+            # 失败的条目不再重试，合并后下次运行会重新分片
+            lease.release(done=True, summarized=summarized, failed=failed)
+            finished.append(shard)
+        return finished
+
+    def _summarize_shard(self, shard, lease):
+        """
+        :param lease: 该分片的租约，租约丢失时取消总结
+        :return: (已完成条目数, 失败条目数)
+        """
+        reader = ArxivReader(self._path(shard, "input.jsonl"), self._path(shard, "jsonl"), **self.reader_options)
+        try:
+            asyncio.run(self._summarize_while_held(reader, lease))
+            failed = sum(1 for key in reader.data.keys() if reader.output_index.get(key) is None)
+            return len(reader.output_data), failed
+        finally:
+            reader.close()
+
+    async def _summarize_while_held(self, reader, lease):
+        task = asyncio.create_task(reader.summarize_all())
+        while not task.done():
+            await asyncio.wait({task}, timeout=min(1.0, self.lease_ttl / 3))
+            if lease.lost and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+                return
+        task.result()
+
+    def status(self):
+        """
+        :return: 各分片的租约状态列表，未被认领的分片为None
+        """
+        plan = self._load_plan()
+        if plan is None:
+            return []
+        return [Lease(self._path(shard, "lease")).state() for shard in range(plan["shards"])]
+
+    def merge(self):
+        """
+        所有分片完成后按输入文件中的顺序把各分片的结果写入输出文件，然后删除分片目录；
+        合并结果与分片数、工作进程数和完成顺序无关
+        :return: 是否已合并，仍有未完成的分片时返回False
+        """
+        plan = self._load_plan()
+        if plan is None:
+            return True
+        pending = [shard for shard, state in enumerate(self.status()) if not (state or {}).get("done")]
+        if pending:
+            logging.warning(f"Shards {pending} are not finished yet, not merging.")
+            return False
+
+        results = {}
+        for shard in range(plan["shards"]):
+            with open_storage(self._path(shard, "jsonl")) as storage:
+                results.update(storage.items())
+        merged = []
+        with open_storage(self.output_file, table="summaries", flush_every=1000) as output:
+            with open_storage(self.input_file, table="abstracts") as data:
+                for key in data.keys():
+                    entry = results.pop(key, None)
+                    if entry is not None and key not in output:
+                        output[key] = entry
+                        merged.append((key, entry))
+            # 分片后从输入文件中删除的条目按键排序追加
+            for key in sorted(results):
+                if key not in output:
+                    output[key] = results[key]
+                    merged.append((key, results[key]))
+
+        if self.search_index:
+            from utils.search import SearchIndex
+            index = SearchIndex(self.search_index)
+            index.build(merged)
+            index.close()
+        shutil.rmtree(self.shard_dir)
+        logging.info(f"Merged {len(merged)} entries from {plan['shards']} shards into {self.output_file}")
+        return True
+
+    def run(self, workers=None):
+        """
+        在本机启动多个工作进程处理所有分片，结束后合并
+        :param workers: 工作进程数，默认等于分片数
+        :return: 是否已合并
+        """
+        plan = self.plan()
+        workers = workers or plan["shards"]
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_work, args=(self._options(), worker)) for worker in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        failed = [worker for worker, process in enumerate(processes) if process.exitcode]
+        if failed:
+            logging.error(f"Workers {failed} exited with errors, rerun to resume their shards.")
+        return self.merge()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sharder = ArxivSharder("abstracts.json", "abstracts_summary.json")
+    sharder.run()
@@ -1,11 +1,23 @@
-import json
+import os
 import csv
+import json
+import shutil
+import hashlib
+import tempfile
 from datetime import datetime
+from utils.storage import open_storage, atomic_write, SQLITE_SUFFIXES
+from utils.jsonstream import iter_json_object
+from utils.metrics import metrics
+
+CSV_FIELDS = ['Title', 'Link', 'Abs', 'Year-Month', 'Summary', 'Method Category', 'Paper Category', 'Alternates']
+
 
 class ArixvWriter:
     def __init__(self, json_file_path):
         self.json_file_path = json_file_path
         self.papers = []
+        # SQLite论文库按类别切片查询，不把全部论文读入内存
+        self.store = None
 
     def clean_category(self, category, index=None):
         """
@@ -36,29 +48,91 @@ class ArixvWriter:
         return cleaned
 
     def process_data(self):
-        """加载 JSON 文件并解析数据"""
-        with open(self.json_file_path, 'r', encoding='utf-8') as file:
-            self.json_data = json.load(file)
+        """加载总结结果(JSON/JSONL/SQLite)并解析数据"""
+        if self.json_file_path.endswith(SQLITE_SUFFIXES):
+            self.store = open_storage(self.json_file_path, table="summaries")
+            return
+
+        with open_storage(self.json_file_path, table="summaries") as storage:
+            self.json_data = dict(storage.items())
 
         for url, details in self.json_data.items():
-            title = details.get('title', '').replace('\n', ' ')  # 移除换行符
-            link = details.get('link', '')
-            abstract = details.get('abstract', '')
-            published_date = details.get('published', '')
-            year_month = self._get_year_month(published_date)
-            method_category = self.clean_category(details.get('method', ''), link)
-            paper_category = self.clean_category(details.get('type', ''), link)
-            summary = details.get('summary', '')
-
-            self.papers.append({
-                'Title': title,
-                'Link': link,
-                'Abs': abstract,
-                'Year-Month': year_month,
-                'Summary': summary,
-                'Method Category': method_category,
-                'Paper Category': paper_category,
-            })
+            if self._is_duplicate(details):
+                continue
+            self.papers.append(self._to_row(details))
+
+    @staticmethod
+    def _is_duplicate(details):
+        """近似重复论文的占位记录，其链接已作为备用链接并入代表论文"""
+        return isinstance(details, dict) and bool(details.get('duplicate_of'))
+
+    def _to_row(self, details):
+        """将总结结果中的单条记录转换为输出行"""
+        title = details.get('title', '').replace('\n', ' ')  # 移除换行符
+        link = details.get('link', '')
+        abstract = details.get('abstract', '')
+        published_date = details.get('published', '')
+        year_month = self._get_year_month(published_date)
+        method_category = self.clean_category(details.get('method') or '', link)
+        paper_category = self.clean_category(details.get('type') or '', link)
+        summary = details.get('summary', '')
+        alternates = '; '.join(details.get('alternates') or [])
+
+        return {
+            'Title': title,
+            'Link': link,
+            'Abs': abstract,
+            'Year-Month': year_month,
+            'Summary': summary,
+            'Method Category': method_category,
+            'Paper Category': paper_category,
+            'Alternates': alternates,
+        }
+
+    def _has_papers(self):
+        if self.store is not None:
+            return len(self.store) > 0
+        return bool(self.papers)
+
+    def _iter_papers(self):
+        """逐条产出输出行"""
+        if self.store is None:
+            yield from self.papers
+            return
+        for _, details in self.store.items():
+            if not self._is_duplicate(details):
+                yield self._to_row(details)
+
+    def _sections(self):
+        """
+        按方法和类别整理论文
+        :return: {method: {category: 产出该类别论文的函数}}，保持首次出现的顺序
+        """
+        organized = {}
+        if self.store is None:
+            for paper in self.papers:
+                method = paper['Method Category']
+                category = paper['Paper Category']
+                organized.setdefault(method, {}).setdefault(category, []).append(paper)
+            return {method: {category: (lambda papers=papers: papers)
+                             for category, papers in categories.items()}
+                    for method, categories in organized.items()}
+
+        # 多个原始分类清理后可能落到同一类别，逐个按索引切片查询后拼接
+        for raw_method, raw_type, _ in self.store.categories():
+            method = self.clean_category(raw_method)
+            category = self.clean_category(raw_type)
+            organized.setdefault(method, {}).setdefault(category, []).append((raw_method, raw_type))
+
+        def loader(raw_pairs):
+            for raw_method, raw_type in raw_pairs:
+                for _, details in self.store.query(method=raw_method, paper_type=raw_type):
+                    if not self._is_duplicate(details):
+                        yield self._to_row(details)
+
+        return {method: {category: (lambda raw_pairs=raw_pairs: loader(raw_pairs))
+                         for category, raw_pairs in categories.items()}
+                for method, categories in organized.items()}
 
     @staticmethod
     def _get_year_month(date_string):
@@ -68,92 +142,448 @@ class ArixvWriter:
         except ValueError:
             return "Unknown"
 
+    @metrics.stage("render.csv")
     def save_to_csv(self, file_name):
         """保存为CSV文件"""
-        if not self.papers:
+        if not self._has_papers():
             print("No papers to save. Process the data first.")
             return
 
-        keys = ['Title', 'Link', 'Abs', 'Year-Month', 'Summary', 'Method Category', 'Paper Category']
         with open(file_name, mode='w', newline='', encoding='utf-8-sig') as file:
-            writer = csv.DictWriter(file, fieldnames=keys)
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
             writer.writeheader()
-            writer.writerows(self.papers)
+            writer.writerows(self._iter_papers())
 
         print(f"CSV file saved as {file_name}")
 
-    # def create_anchor(self, method, category=None):
-    #     """创建唯一的锚点ID"""
-    #     method = method.split(' (')[0].lower().replace(' ', '-')
-    #     if category:
-    #         category = category.split(' (')[0].lower().replace(' ', '-')
-    #         return f"{method}-{category}"
-    #     return method
+    @staticmethod
+    def create_anchor(method, category=None):
+        """创建唯一的锚点ID，包含层级信息"""
+        anchor = method.lower().replace(' ', '-').replace('(', '').replace(')', '')
+        if category:
+            anchor += '-' + category.lower().replace(' ', '-').replace('(', '').replace(')', '')
+        return anchor
 
+    def _render_toc(self, organized):
+        """
+        渲染目录
+        :param organized: {method: 可迭代的category}
+        """
+        lines = ["# Table of Contents\n\n"]
+        for method, categories in organized.items():
+            clean_method = method.split(' (')[0]  # 移除括号中的说明
+            lines.append(f"- [{clean_method}](#{self.create_anchor(method)})\n")
+            for category in categories:
+                clean_category = category.split(' (')[0]  # 移除括号中的说明
+                lines.append(f"  - [{clean_category}](#{self.create_anchor(method, category)})\n")
+        lines.append("\n")
+        return "".join(lines)
+
+    def _render_method_header(self, method):
+        clean_method = method.split(' (')[0]
+        # 添加与大纲一致的锚点
+        return f"# {clean_method}\n<a id=\"{self.create_anchor(method)}\"></a>\n\n"
+
+    def _render_category_header(self, method, category):
+        clean_category = category.split(' (')[0]
+        # 添加与大纲一致的锚点
+        return f"## {clean_category}\n<a id=\"{self.create_anchor(method, category)}\"></a>\n\n"
+
+    @staticmethod
+    def _render_paper(idx, paper):
+        # 近似重复的其他版本作为备用链接列在同一条目下
+        alternates = [link for link in (paper.get('Alternates') or '').split('; ') if link]
+        alternates_line = (f"- **Alternates**: {', '.join(f'[{link}]({link})' for link in alternates)}\n"
+                           if alternates else "")
+        return (f"### {idx}. {paper['Title']}\n"
+                f"- **Link**: [{paper['Link']}]({paper['Link']})\n"
+                f"{alternates_line}"
+                f"- **Summary**: {paper['Summary']})\n"
+                f"- **Abstract**: {paper['Abs']}\n"
+                f"- **Year-Month**: {paper['Year-Month']}\n\n")
+
+    @metrics.stage("render.markdown")
     def save_to_markdown(self, file_name):
         """保存为Markdown文件"""
-        if not self.papers:
+        if not self._has_papers():
             print("No papers to save. Process the data first.")
             return
 
         # 整理论文按方法和类别分类
-        organized_papers = {}
-        for paper in self.papers:
-            method = paper['Method Category']
-            category = paper['Paper Category']
-            if method not in organized_papers:
-                organized_papers[method] = {}
-            if category not in organized_papers[method]:
-                organized_papers[method][category] = []
-            organized_papers[method][category].append(paper)
-
-        def create_anchor(method, category=None):
-            """创建唯一的锚点ID，包含层级信息"""
-            anchor = method.lower().replace(' ', '-').replace('(', '').replace(')', '')
-            if category:
-                anchor += '-' + category.lower().replace(' ', '-').replace('(', '').replace(')', '')
-            return anchor
+        organized_papers = self._sections()
 
         # 写入Markdown
         with open(file_name, mode='w', encoding='utf-8') as file:
-            file.write("# Table of Contents\n\n")
-            for method in organized_papers:
-                clean_method = method.split(' (')[0]  # 移除括号中的说明
-                method_anchor = create_anchor(method)
-                file.write(f"- [{clean_method}](#{method_anchor})\n")
-                for category in organized_papers[method]:
-                    clean_category = category.split(' (')[0]  # 移除括号中的说明
-                    category_anchor = create_anchor(method, category)
-                    file.write(f"  - [{clean_category}](#{category_anchor})\n")
-            file.write("\n")
+            file.write(self._render_toc(organized_papers))
 
             for method, categories in organized_papers.items():
-                clean_method = method.split(' (')[0]
-                method_anchor = create_anchor(method)
-                file.write(f"# {clean_method}\n")
-                file.write(f"<a id=\"{method_anchor}\"></a>\n\n")  # 添加与大纲一致的锚点
-
-                for category, papers in categories.items():
-                    clean_category = category.split(' (')[0]
-                    category_anchor = create_anchor(method, category)
-                    file.write(f"## {clean_category}\n")
-                    file.write(f"<a id=\"{category_anchor}\"></a>\n\n")  # 添加与大纲一致的锚点
-
-                    for idx, paper in enumerate(papers, start=1):
-                        file.write(f"### {idx}. {paper['Title']}\n")
-                        file.write(f"- **Link**: [{paper['Link']}]({paper['Link']})\n")
-                        file.write(f"- **Summary**: {paper['Summary']})\n")
-                        file.write(f"- **Abstract**: {paper['Abs']}\n")
-                        file.write(f"- **Year-Month**: {paper['Year-Month']}\n\n")
+                file.write(self._render_method_header(method))
+
+                for category, load_papers in categories.items():
+                    file.write(self._render_category_header(method, category))
+
+                    for idx, paper in enumerate(load_papers(), start=1):
+                        file.write(self._render_paper(idx, paper))
 
         print(f"Markdown file saved as {file_name}")
 
+    @metrics.stage("render.incremental")
+    def save_incremental(self, md_file, csv_file=None):
+        """
+        增量更新Markdown和CSV文件，无需先调用process_data
+        状态保存在 <md_file>.state.json，每个(方法, 类别)小节已渲染的内容和输出行缓存在 <md_file>.sections/ 下；
+        每次只读取输入中新增的记录(JSONL从上次的偏移量读，SQLite从上次的写入序号读)，新论文追加到所在小节，CSV只追加新行；
+        已渲染的论文再次出现且内容变化时(如并入了近似重复论文的备用链接)，按状态中记录的内容哈希发现变化，
+        只重建它所在的小节，CSV中对应的行原地替换。删除状态文件即可完整重建
+        :param md_file: Markdown文件路径
+        :param csv_file: CSV文件路径，为None时不输出CSV
+        """
+        state_path = f"{md_file}.state.json"
+        sections_dir = f"{md_file}.sections"
+        os.makedirs(sections_dir, exist_ok=True)
+        state = self._load_incremental_state(state_path, sections_dir, csv_file)
+        # 键 -> [输出行的内容哈希, 方法, 类别]，近似重复的占位记录哈希为None
+        rendered = state["rendered"]
+        sections = {(method, category): [count, size, rows_size]
+                    for method, category, count, size, rows_size in state["sections"]}
+
+        # 同一键在新增部分中出现多次时只取最后一次
+        latest = {}
+        for key, details in self._iter_new_details(state):
+            latest[key] = details
+
+        # 收集新增论文并按小节分组，已渲染论文的变化按原小节分组
+        new_papers = {}
+        new_rows = []
+        changed = {}
+        moved = {}
+        for key, details in latest.items():
+            paper = None if self._is_duplicate(details) else self._to_row(details)
+            section = (paper['Method Category'], paper['Paper Category']) if paper else None
+            digest = self._row_digest(paper) if paper else None
+            previous = rendered.get(key)
+            if previous is not None and previous[0] == digest:
+                continue
+            rendered[key] = [digest, *(section or (None, None))]
+            old_section = tuple(previous[1:]) if previous is not None and previous[0] is not None else None
+            if old_section is not None:
+                # 小节不变时原地替换，换了小节时从原小节删除后作为新论文追加(CSV仍原地替换)
+                changed.setdefault(old_section, {})[key] = paper if section == old_section else None
+                if section is None or section == old_section:
+                    continue
+                moved[key] = paper
+            elif section is None:
+                continue
+            else:
+                new_rows.append(paper)
+            new_papers.setdefault(section, []).append((key, paper))
+
+        if not new_papers and not changed and os.path.exists(md_file):
+            self._save_incremental_state(state_path, state, rendered, sections)
+            print(f"No new papers, {md_file} is up to date.")
+            return
+
+        # 重建内容变化的小节，记下CSV中需要替换(或删除)的行
+        replaced_rows = {}
+        for section, replacements in changed.items():
+            for key, link in self._rebuild_section(sections_dir, section, replacements, sections).items():
+                replaced_rows[link] = replacements[key] or moved.get(key)
+
+        # 新论文的渲染结果和输出行追加到对应小节的缓存文件
+        for section, papers in new_papers.items():
+            count, size, rows_size = sections.setdefault(section, [0, 0, 0])
+            blocks = "".join(self._render_paper(idx, paper)
+                             for idx, (_, paper) in enumerate(papers, start=count + 1))
+            rows = "".join(json.dumps([key, paper], ensure_ascii=False) + "\n" for key, paper in papers)
+            with open(self._section_path(sections_dir, section), "a", encoding="utf-8") as file:
+                file.write(blocks)
+            with open(self._section_rows_path(sections_dir, section), "a", encoding="utf-8") as file:
+                file.write(rows)
+            sections[section] = [count + len(papers), size + len(blocks.encode("utf-8")),
+                                 rows_size + len(rows.encode("utf-8"))]
+
+        if csv_file:
+            new_file = not os.path.exists(csv_file) or state["csv_bytes"] == 0
+            if changed and not new_file:
+                self._rewrite_csv(csv_file, replaced_rows, new_rows)
+            else:
+                with open(csv_file, mode='w' if new_file else 'a', newline='',
+                          encoding='utf-8-sig' if new_file else 'utf-8') as file:
+                    writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+                    if new_file:
+                        writer.writeheader()
+                    writer.writerows(new_rows)
+            state["csv_bytes"] = os.path.getsize(csv_file)
+
+        # 目录和标题很小，直接重新生成；小节内容直接拼接缓存文件
+        organized = {}
+        for method, category in sections:
+            organized.setdefault(method, []).append(category)
+
+        def write(file):
+            file.write(self._render_toc(organized))
+            for method, categories in organized.items():
+                file.write(self._render_method_header(method))
+                for category in categories:
+                    file.write(self._render_category_header(method, category))
+                    with open(self._section_path(sections_dir, (method, category)), "r", encoding="utf-8") as part:
+                        shutil.copyfileobj(part, file)
+
+        atomic_write(md_file, write)
+        self._save_incremental_state(state_path, state, rendered, sections)
+        print(f"Markdown file updated as {md_file} "
+              f"({len(new_rows)} new papers, {sum(len(papers) for papers in changed.values())} updated)")
+
+    def _rebuild_section(self, sections_dir, section, replacements, sections):
+        """
+        按缓存的输出行重新渲染一个小节
+        :param replacements: {键: 新的输出行}，为None表示从该小节移除
+        :param sections: 小节状态，原地更新；小节变空时删除
+        :return: {键: 原输出行的链接}，用于替换CSV中的行
+        """
+        rows_path = self._section_rows_path(sections_dir, section)
+        entries, replaced = [], {}
+        with open(rows_path, "r", encoding="utf-8") as file:
+            for line in file:
+                key, paper = json.loads(line)
+                if key in replacements:
+                    replaced[key] = paper['Link']
+                    paper = replacements[key]
+                    if paper is None:
+                        continue
+                entries.append((key, paper))
+
+        md_path = self._section_path(sections_dir, section)
+        if not entries:
+            os.remove(md_path)
+            os.remove(rows_path)
+            del sections[section]
+            return replaced
+        atomic_write(md_path, lambda file: file.writelines(
+            self._render_paper(idx, paper) for idx, (_, paper) in enumerate(entries, start=1)))
+        atomic_write(rows_path, lambda file: file.writelines(
+            json.dumps([key, paper], ensure_ascii=False) + "\n" for key, paper in entries))
+        sections[section] = [len(entries), os.path.getsize(md_path), os.path.getsize(rows_path)]
+        return replaced
+
+    @staticmethod
+    def _rewrite_csv(csv_file, replaced_rows, new_rows):
+        """
+        逐行重写CSV：按链接替换或删除已有的行，再追加新行
+        """
+        def write(file):
+            # 与save_to_csv一致，带BOM便于Excel识别编码
+            file.write('\ufeff')
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            with open(csv_file, "r", newline='', encoding='utf-8-sig') as old:
+                for row in csv.DictReader(old):
+                    if row['Link'] in replaced_rows:
+                        row = replaced_rows.pop(row['Link'])
+                        if row is None:
+                            continue
+                    writer.writerow(row)
+            writer.writerows(new_rows)
+
+        atomic_write(csv_file, write, newline='')
+
+    @staticmethod
+    def _row_digest(paper):
+        return hashlib.sha1(json.dumps(paper, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @metrics.stage("render.streaming")
+    def save_streaming(self, md_file, csv_file=None, max_open_files=64):
+        """
+        流式生成Markdown和CSV，无需先调用process_data，峰值内存与论文总数无关
+        第一遍逐条读取输入：CSV行直接写出，输出行按(方法, 类别)分桶写入临时JSONL文件；
+        第二遍按小节首次出现的顺序逐个读回各桶渲染Markdown
+        :param md_file: Markdown文件路径
+        :param csv_file: CSV文件路径，为None时不输出CSV
+        :param max_open_files: 同时打开的桶文件数上限
+        """
+        sections = {}
+        with tempfile.TemporaryDirectory(prefix="arxiv-writer-") as spill_dir:
+            buckets = {}
+            csv_handle = open(csv_file, mode='w', newline='', encoding='utf-8-sig') if csv_file else None
+            try:
+                csv_writer = csv.DictWriter(csv_handle, fieldnames=CSV_FIELDS) if csv_handle else None
+                if csv_writer:
+                    csv_writer.writeheader()
+                for _, details in self._iter_source():
+                    if self._is_duplicate(details):
+                        continue
+                    paper = self._to_row(details)
+                    if csv_writer:
+                        csv_writer.writerow(paper)
+                    section = (paper['Method Category'], paper['Paper Category'])
+                    sections[section] = sections.get(section, 0) + 1
+                    if section not in buckets:
+                        if len(buckets) >= max_open_files:
+                            for handle in buckets.values():
+                                handle.close()
+                            buckets.clear()
+                        buckets[section] = open(self._section_path(spill_dir, section), "a", encoding="utf-8")
+                    buckets[section].write(json.dumps(paper, ensure_ascii=False) + "\n")
+            finally:
+                for handle in buckets.values():
+                    handle.close()
+                if csv_handle:
+                    csv_handle.close()
+
+            if not sections:
+                print("No papers to save.")
+                return
+
+            organized = {}
+            for method, category in sections:
+                organized.setdefault(method, []).append(category)
+
+            def write(file):
+                file.write(self._render_toc(organized))
+                for method, categories in organized.items():
+                    file.write(self._render_method_header(method))
+                    for category in categories:
+                        file.write(self._render_category_header(method, category))
+                        with open(self._section_path(spill_dir, (method, category)), "r", encoding="utf-8") as bucket:
+                            for idx, line in enumerate(bucket, start=1):
+                                file.write(self._render_paper(idx, json.loads(line)))
+
+            atomic_write(md_file, write)
+
+        if csv_file:
+            print(f"CSV file saved as {csv_file}")
+        print(f"Markdown file saved as {md_file} ({sum(sections.values())} papers in {len(sections)} sections)")
+
+    def _iter_source(self):
+        """
+        逐条读取总结结果，不把整个文件读入内存
+        JSON按事件增量解析；JSONL先扫描一遍只记录每个键最后出现的行号，第二遍只产出最新的记录；
+        SQLite直接使用游标
+        :return: (键, 记录)的生成器
+        """
+        path = self.json_file_path
+        if path.endswith(SQLITE_SUFFIXES):
+            with open_storage(path, table="summaries") as store:
+                yield from store.items()
+        elif path.endswith('.jsonl'):
+            last_line = {}
+            for lineno, (key, _) in enumerate(self._iter_jsonl(path)):
+                last_line[key] = lineno
+            for lineno, (key, details) in enumerate(self._iter_jsonl(path)):
+                if last_line[key] == lineno:
+                    yield key, details
+        else:
+            yield from iter_json_object(path)
+
+    @staticmethod
+    def _iter_jsonl(path):
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "key" in item:
+                    yield item["key"], item["value"]
+                else:
+                    yield item["link"], item["abstract"]
+
+    @staticmethod
+    def _section_path(sections_dir, section):
+        digest = hashlib.sha1("\0".join(section).encode("utf-8")).hexdigest()
+        return os.path.join(sections_dir, f"{digest}.md")
+
+    @classmethod
+    def _section_rows_path(cls, sections_dir, section):
+        # 小节的输出行，内容变化时据此重建小节
+        return cls._section_path(sections_dir, section)[:-len(".md")] + ".jsonl"
+
+    def _load_incremental_state(self, state_path, sections_dir, csv_file):
+        """
+        加载增量状态，并把小节缓存和CSV截断到状态中记录的长度，丢弃上次中断时多写的内容
+        """
+        state = None
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            # 小节缓存被删除、CSV列发生变化或状态是旧格式(没有内容哈希)时无法续写，退回完整重建
+            if (state.get("csv_fields") != CSV_FIELDS or not isinstance(state.get("rendered"), dict)
+                    or not all(os.path.exists(self._section_path(sections_dir, (method, category)))
+                               and os.path.exists(self._section_rows_path(sections_dir, (method, category)))
+                               for method, category, *_ in state["sections"])):
+                state = None
+
+        if state is None:
+            for name in os.listdir(sections_dir):
+                os.remove(os.path.join(sections_dir, name))
+            return {"source": {}, "rendered": {}, "sections": [], "csv_bytes": 0, "csv_fields": CSV_FIELDS}
+
+        for method, category, _, size, rows_size in state["sections"]:
+            for path, expected in ((self._section_path(sections_dir, (method, category)), size),
+                                   (self._section_rows_path(sections_dir, (method, category)), rows_size)):
+                if os.path.getsize(path) != expected:
+                    os.truncate(path, expected)
+        if csv_file and os.path.exists(csv_file) and os.path.getsize(csv_file) != state["csv_bytes"]:
+            os.truncate(csv_file, state["csv_bytes"])
+        return state
+
+    @staticmethod
+    def _save_incremental_state(state_path, state, rendered, sections):
+        state["rendered"] = rendered
+        state["sections"] = [[method, category, *sizes] for (method, category), sizes in sections.items()]
+        atomic_write(state_path, lambda file: json.dump(state, file, ensure_ascii=False))
+
+    def _iter_new_details(self, state):
+        """
+        读取上次增量更新之后新增的记录，并在state["source"]中记录新的读取位置
+        JSONL按字节偏移量续读(文件被压缩重写后退回全量扫描)，SQLite按写入序号续读，JSON只能全量读取
+        :return: (键, 记录)的生成器
+        """
+        source = state["source"]
+        path = self.json_file_path
+        if path.endswith(SQLITE_SUFFIXES):
+            with open_storage(path, table="summaries") as store:
+                for version, key, details in store.items_after(source.get("version", 0)):
+                    source["version"] = version
+                    yield key, details
+        elif path.endswith('.jsonl'):
+            if not os.path.exists(path):
+                return
+            stat = os.stat(path)
+            offset = source.get("offset", 0)
+            if source.get("inode") != stat.st_ino or stat.st_size < offset:
+                offset = 0
+            with open(path, "rb") as file:
+                file.seek(offset)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        # 写了一半的末行留到下次再读
+                        break
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    if "key" in item:
+                        yield item["key"], item["value"]
+                    else:
+                        yield item["link"], item["abstract"]
+            source.update({"inode": stat.st_ino, "offset": offset})
+        else:
+            with open_storage(path, table="summaries") as storage:
+                yield from storage.items()
+
 
 # Usage Example:
-# Specify the path to the JSON file
-json_file_path = 'abstracts_summary.json'
+if __name__ == "__main__":
+    # Specify the path to the JSON file
+    json_file_path = 'abstracts_summary.json'
+
+    processor = ArixvWriter(json_file_path)
+    processor.process_data()  # 加载并解析数据
+    processor.save_to_csv("papers.csv")       # 保存为 CSV
+    processor.save_to_markdown("papers.md")  # 保存为 Markdown
 
-processor = ArixvWriter(json_file_path)
-processor.process_data()  # 加载并解析数据
-processor.save_to_csv("papers.csv")       # 保存为 CSV
-processor.save_to_markdown("papers.md")  # 保存为 Markdown
+    # 语料很大时使用流式模式，峰值内存与论文总数无关
+    # ArixvWriter(json_file_path).save_streaming("papers.md", "papers.csv")
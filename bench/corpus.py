@@ -0,0 +1,119 @@
+"""
+基准测试用的合成语料：确定性的arXiv ID、论文元数据、链接文件、摘要存储和总结存储
+同一个ID在任何进程中都生成同样的论文，替身arXiv服务和各阶段的输入因此保持一致
+"""
+import random
+import zlib
+from utils.storage import open_storage
+
+# 2020-01 到 2025-12 的年月，ID按年月轮转，每月最多99999篇
+MONTHS = [f"{year:02d}{month:02d}" for year in range(20, 26) for month in range(1, 13)]
+CATEGORIES = ["cs.AI", "cs.CL", "cs.LG", "cs.CV", "cs.RO", "cs.MA", "cs.CR", "stat.ML"]
+METHODS = ["reason", "decision", "plan", "memory", "tool", "reward", "world_model", "device_operation",
+           "robotics", "self_improvement", "multi_agent", "security", "other"]
+TYPES = ["textual_reasoning", "multimodal_reasoning", "textual_open_ended_tasks",
+         "multimodal_open_ended_tasks", "theory", "survey", "benchmark", "other"]
+WORDS = ("agent language model reasoning planning memory tool reward policy environment benchmark "
+         "task learning retrieval multimodal vision robot control feedback evaluation dataset training "
+         "inference search graph knowledge instruction alignment safety attack defense simulation world "
+         "trajectory action observation latent representation transformer diffusion verifier critic "
+         "curriculum exploration coordination communication decomposition hierarchical efficient robust "
+         "scalable adaptive novel framework approach method results experiments outperforms baseline").split()
+
+
+def synthetic_id(index):
+    """
+    :param index: 论文序号，从0开始
+    :return: 新式arXiv ID，如 2001.00001
+    """
+    return f"{MONTHS[index % len(MONTHS)]}.{index // len(MONTHS) + 1:05d}"
+
+
+def synthetic_ids(count):
+    return [synthetic_id(index) for index in range(count)]
+
+
+def _sentence(rng, low, high):
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return " ".join(words).capitalize() + "."
+
+
+def paper(arxiv_id):
+    """
+    按ID生成确定性的论文元数据，字段与utils.atom.parse_entry一致
+    :param arxiv_id: 不带版本号的arXiv ID
+    """
+    rng = random.Random(zlib.crc32(arxiv_id.encode("utf-8")))
+    yymm = arxiv_id.split(".")[0]
+    published = f"20{yymm[:2]}-{yymm[2:]}-{rng.randint(1, 28):02d}T00:00:00Z"
+    categories = rng.sample(CATEGORIES, rng.randint(1, 3))
+    return {
+        "id": arxiv_id,
+        "version": rng.randint(1, 3),
+        "title": _sentence(rng, 6, 12)[:-1],
+        "abstract": " ".join(_sentence(rng, 12, 24) for _ in range(rng.randint(5, 9))),
+        "authors": [f"Author {rng.randint(1, 5000)}" for _ in range(rng.randint(1, 6))],
+        "categories": categories,
+        "primary_category": categories[0],
+        "published": published,
+        "updated": published,
+        "doi": None,
+    }
+
+
+def link(arxiv_id, index=0):
+    # 轮流使用abs和pdf两种写法，覆盖链接解析的不同分支
+    return f"https://arxiv.org/{'abs' if index % 2 else 'pdf'}/{arxiv_id}"
+
+
+def write_links(path, count):
+    """
+    生成包含count个arXiv链接的Markdown文件
+    :return: 链接列表
+    """
+    links = [link(arxiv_id, index) for index, arxiv_id in enumerate(synthetic_ids(count))]
+    with open(path, "w", encoding="utf-8") as file:
+        for index, url in enumerate(links):
+            file.write(f"- [{paper(synthetic_id(index))['title']}]({url})\n")
+    return links
+
+
+def abstract_record(arxiv_id):
+    """
+    :return: 与ArxivAbstractFetcher存储格式一致的摘要记录
+    """
+    entry = paper(arxiv_id)
+    return {"id": arxiv_id, "link": f"https://arxiv.org/pdf/{arxiv_id}", **{
+        key: entry[key] for key in ("title", "abstract", "authors", "categories", "primary_category",
+                                    "published", "updated", "version", "doi")}}
+
+
+def summary_record(arxiv_id):
+    """
+    :return: 与ArxivReader输出格式一致的总结记录，方法和类型由ID确定
+    """
+    record = abstract_record(arxiv_id)
+    digest = zlib.crc32(arxiv_id.encode("utf-8"))
+    record.update({"summary": f"[{record['title'][:40]}]通过合成方法解决了测试问题",
+                   "method": METHODS[digest % len(METHODS)],
+                   "type": TYPES[digest // len(METHODS) % len(TYPES)]})
+    return record
+
+
+def write_store(path, count, make_record, table):
+    """
+    把count篇合成论文写入存储文件(按扩展名选择JSON、JSONL或SQLite)
+    :param make_record: abstract_record或summary_record
+    :param table: SQLite后端的表名
+    """
+    with open_storage(path, table=table, flush_every=1000) as storage:
+        for arxiv_id in synthetic_ids(count):
+            storage[f"https://arxiv.org/pdf/{arxiv_id}"] = make_record(arxiv_id)
+
+
+def write_abstracts(path, count):
+    write_store(path, count, abstract_record, "abstracts")
+
+
+def write_summaries(path, count):
+    write_store(path, count, summary_record, "summaries")
@@ -0,0 +1,144 @@
+"""
+本地的arXiv API替身服务，用于离线测试和基准测试ArxivAbstractFetcher
+按请求的id_list返回bench.corpus生成的确定性Atom Feed，可注入延迟、5xx错误、429限流和缺失条目
+用法: python -m bench.fake_arxiv --port 8001，然后把fetcher的api_url设为 http://127.0.0.1:8001/api/query
+"""
+import argparse
+import random
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from bench import corpus
+from bench.faults import FaultInjector
+
+FEED_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">\n'
+               '<title>arXiv Query Results</title>\n')
+
+
+def render_entry(arxiv_id, version=None):
+    """
+    :param arxiv_id: 不带版本号的arXiv ID
+    :param version: 请求的版本号，为None时返回最新版本
+    :return: 一个<entry>元素的文本
+    """
+    paper = corpus.paper(arxiv_id)
+    version = version or paper["version"]
+    authors = "".join(f"<author><name>{escape(name)}</name></author>" for name in paper["authors"])
+    categories = "".join(f'<category term="{term}" scheme="http://arxiv.org/schemas/atom"/>'
+                         for term in paper["categories"])
+    return (f"<entry>\n<id>http://arxiv.org/abs/{arxiv_id}v{version}</id>\n"
+            f"<updated>{paper['updated']}</updated>\n<published>{paper['published']}</published>\n"
+            f"<title>{escape(paper['title'])}</title>\n<summary>{escape(paper['abstract'])}</summary>\n"
+            f"{authors}\n<arxiv:primary_category term=\"{paper['primary_category']}\" "
+            f"scheme=\"http://arxiv.org/schemas/atom\"/>\n{categories}\n</entry>\n")
+
+
+def render_feed(arxiv_ids, keep=lambda arxiv_id: True):
+    """
+    :param arxiv_ids: 请求的ID列表，可以带版本号
+    :param keep: 决定是否返回某个ID的函数，用于模拟响应中缺失的条目
+    :return: Atom Feed文本
+    """
+    entries = []
+    for requested in arxiv_ids:
+        base, _, version = requested.partition("v")
+        if keep(requested):
+            entries.append(render_entry(base, int(version) if version.isdigit() else None))
+    return FEED_HEADER + "".join(entries) + "</feed>\n"
+
+
+class FakeArxivState:
+    """
+    替身服务的状态：请求计数、返回的条目数和故障注入
+    """
+
+    def __init__(self, faults=None, missing_rate=0.0, seed=0):
+        """
+        :param faults: FaultInjector，为None时不注入故障
+        :param missing_rate: 批量响应中随机缺失条目的比例，缺失的ID由fetcher逐个重试
+        :param seed: 缺失条目的随机种子
+        """
+        self.faults = faults or FaultInjector()
+        self.missing_rate = missing_rate
+        self._random = random.Random(seed)
+        self.requests = {}
+        self.entries = 0
+        self._lock = threading.Lock()
+
+    def count(self, endpoint, entries=0):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.entries += entries
+
+    def keep(self, arxiv_ids):
+        """
+        :return: 决定条目是否出现在响应中的函数，单篇请求总是返回
+        """
+        if len(arxiv_ids) <= 1 or not self.missing_rate:
+            return lambda arxiv_id: True
+        with self._lock:
+            dropped = {arxiv_id for arxiv_id in arxiv_ids if self._random.random() < self.missing_rate}
+        return lambda arxiv_id: arxiv_id not in dropped
+
+
+class FakeArxivHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, status=200, content_type="application/atom+xml; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith("/api/query"):
+            self.state.count(url.path)
+            self._send(f"Unknown path {url.path}".encode("utf-8"), status=404, content_type="text/plain")
+            return
+        status = self.state.faults.apply()
+        if status is not None:
+            self.state.count(url.path)
+            self._send(f"Injected error {status}".encode("utf-8"), status=status, content_type="text/plain",
+                       headers=self.state.faults.headers(status))
+            return
+        query = parse_qs(url.query)
+        arxiv_ids = [arxiv_id for arxiv_id in ",".join(query.get("id_list", [])).split(",") if arxiv_id]
+        feed = render_feed(arxiv_ids, self.state.keep(arxiv_ids))
+        self.state.count(url.path, feed.count("<entry>"))
+        self._send(feed.encode("utf-8"))
+
+
+def serve(host="127.0.0.1", port=8001, handler=FakeArxivHandler, **state_options):
+    """
+    在后台线程中启动替身服务
+    :return: (server, state)，用完后调用server.shutdown()
+    """
+    state = FakeArxivState(**state_options)
+    server = ThreadingHTTPServer((host, port), type("Handler", (handler,), {"state": state}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地arXiv API替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="批量响应中随机缺失条目的比例")
+    FaultInjector.add_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, faults=FaultInjector.from_args(args), missing_rate=args.missing_rate)
+    print(f"Fake arXiv API listening on http://{args.host}:{args.port}/api/query")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
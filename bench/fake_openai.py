@@ -0,0 +1,253 @@
+"""
+本地的OpenAI兼容替身服务，用于离线测试ArxivReader
+支持 /v1/chat/completions、/v1/files 和 /v1/batches 接口，对话接口可注入延迟、5xx错误和429限流
+用法: python -m bench.fake_openai --port 8000，然后把config.yaml中的base_url设为 http://127.0.0.1:8000/v1
+"""
+import argparse
+import email
+import email.policy
+import hashlib
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bench.faults import FaultInjector
+
+METHODS = ["reason", "decision", "plan", "memory", "tool", "reward", "world_model", "device_operation",
+           "robotics", "self_improvement", "multi_agent", "security", "other"]
+TYPES = ["textual_reasoning", "multimodal_reasoning", "textual_open_ended_tasks",
+         "multimodal_open_ended_tasks", "theory", "survey", "benchmark", "other"]
+
+
+def fake_classification(text):
+    digest = int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16)
+    return (f"<method>{METHODS[digest % len(METHODS)]}</method>\n"
+            f"<type>{TYPES[digest // len(METHODS) % len(TYPES)]}</type>")
+
+
+def fake_completion(messages):
+    """
+    按请求内容生成确定性的回答，按提示词要求的输出格式返回总结和/或分类标签
+    :return: 回答文本
+    """
+    content = "".join(message.get("content") or "" for message in messages)
+    papers = re.findall(r'<paper id="(\d+)">\n(.*?)</paper>', content, re.DOTALL)
+    if papers:
+        # 打包分类：按编号逐篇返回标签，与单篇分类使用同样的确定性规则
+        return "\n".join(f'<paper id="{paper_id}">{fake_classification(text)}</paper>' for paper_id, text in papers)
+    title = re.search(r'Title: (.*)', content)
+    title = title.group(1).strip()[:40] if title else "论文"
+    summary = f"[{title}]通过替身方法解决了测试问题"
+    classification = fake_classification(content)
+    if "<summary>" in content:
+        return f"<summary>{summary}</summary>\n{classification}"
+    if "<method>" in content:
+        return classification
+    return summary
+
+
+def completion_body(model, messages):
+    text = fake_completion(messages)
+    prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4 + 1
+    completion_tokens = len(text) // 4 + 1
+    return {
+        "id": f"chatcmpl-{hashlib.md5(text.encode('utf-8')).hexdigest()[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": text}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class FakeOpenAIState:
+    """
+    替身服务的内存状态：上传的文件、批处理任务和请求计数
+    """
+
+    def __init__(self, batch_delay=1.0, faults=None):
+        """
+        :param batch_delay: 批处理从创建到完成的秒数
+        :param faults: 对话接口的FaultInjector，为None时不注入故障
+        """
+        self.batch_delay = batch_delay
+        self.faults = faults or FaultInjector()
+        self.files = {}
+        self.batches = {}
+        self.requests = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def add_file(self, content, filename, purpose):
+        file_id = self.next_id("file")
+        self.files[file_id] = {"id": file_id, "object": "file", "bytes": len(content),
+                               "created_at": int(time.time()), "filename": filename,
+                               "purpose": purpose, "status": "processed", "content": content}
+        return file_id
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        # 创建时就计算好全部结果，等batch_delay秒后才对外显示为完成
+        output_lines = []
+        lines = self.files[input_file_id]["content"].decode("utf-8").splitlines()
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request["body"]
+            output_lines.append(json.dumps({
+                "id": self.next_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": self.next_id("req"),
+                             "body": completion_body(body["model"], body["messages"])},
+                "error": None,
+            }, ensure_ascii=False))
+        output_file_id = self.add_file("\n".join(output_lines).encode("utf-8"), "batch_output.jsonl",
+                                       "batch_output")
+        batch_id = self.next_id("batch")
+        self.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": endpoint, "errors": None,
+            "input_file_id": input_file_id, "completion_window": completion_window,
+            "created_at": int(time.time()), "ready_at": time.time() + self.batch_delay,
+            "output_file_id": output_file_id, "error_file_id": None,
+            "request_counts": {"total": len(output_lines), "completed": len(output_lines), "failed": 0},
+        }
+        return self.batch_view(batch_id)
+
+    def batch_view(self, batch_id):
+        batch = dict(self.batches[batch_id])
+        ready = time.time() >= batch.pop("ready_at")
+        batch["status"] = "completed" if ready else "in_progress"
+        if not ready:
+            batch["output_file_id"] = None
+            batch["request_counts"] = dict(batch["request_counts"], completed=0)
+        return batch
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(body, status, "application/json", headers)
+
+    def _send(self, body, status=200, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _not_found(self):
+        self._send_json({"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}},
+                        status=404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        self.state.count(path)
+        if path.endswith("/chat/completions"):
+            self.handle_chat(json.loads(self._read_body()))
+        elif path.endswith("/files"):
+            self.handle_upload(self._read_body())
+        elif path.endswith("/batches"):
+            request = json.loads(self._read_body())
+            self._send_json(self.state.create_batch(request["input_file_id"], request["endpoint"],
+                                                    request.get("completion_window", "24h")))
+        else:
+            self._not_found()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.state.count(path)
+        batch = re.search(r'/batches/([^/]+)$', path)
+        content = re.search(r'/files/([^/]+)/content$', path)
+        file = re.search(r'/files/([^/]+)$', path)
+        if batch and batch.group(1) in self.state.batches:
+            self._send_json(self.state.batch_view(batch.group(1)))
+        elif content and content.group(1) in self.state.files:
+            self._send(self.state.files[content.group(1)]["content"], content_type="application/octet-stream")
+        elif file and file.group(1) in self.state.files:
+            self._send_json({k: v for k, v in self.state.files[file.group(1)].items() if k != "content"})
+        else:
+            self._not_found()
+
+    def handle_chat(self, request):
+        status = self.state.faults.apply()
+        if status == 429:
+            self._send_json({"error": {"message": "Rate limit reached (injected)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                            status=429, headers=self.state.faults.headers(429))
+        elif status is not None:
+            self._send_json({"error": {"message": "Internal server error (injected)", "type": "server_error"}},
+                            status=status)
+        else:
+            self._send_json(completion_body(request["model"], request["messages"]))
+
+    def handle_upload(self, body):
+        # 用email模块解析multipart/form-data
+        message = email.message_from_bytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body,
+            policy=email.policy.default)
+        fields, content, filename = {}, b"", "upload.jsonl"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                content, filename = part.get_payload(decode=True), part.get_filename()
+            else:
+                fields[name] = part.get_content().strip()
+        file_id = self.state.add_file(content, filename, fields.get("purpose", "batch"))
+        self._send_json({k: v for k, v in self.state.files[file_id].items() if k != "content"})
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # 对冲请求的失败方被取消时客户端会提前断开连接，不输出错误
+        if not isinstance(sys.exc_info()[1], (ConnectionError, json.JSONDecodeError)):
+            super().handle_error(request, client_address)
+
+
+def serve(host="127.0.0.1", port=8000, handler=FakeOpenAIHandler, **state_options):
+    """
+    在后台线程中启动替身服务
+    :return: (server, state)，用完后调用server.shutdown()
+    """
+    state = FakeOpenAIState(**state_options)
+    server = FakeOpenAIServer((host, port), type("Handler", (handler,), {"state": state}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="批处理从创建到完成的秒数")
+    FaultInjector.add_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, batch_delay=args.batch_delay, faults=FaultInjector.from_args(args))
+    print(f"Fake OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
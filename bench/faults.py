@@ -0,0 +1,73 @@
+"""
+替身服务共用的故障注入：固定延迟加随机抖动、按比例返回5xx错误和429限流
+"""
+import random
+import threading
+import time
+
+
+class FaultInjector:
+    """
+    每个请求先等待 latency±jitter 秒，再按error_rate返回500、按throttle_rate返回429
+    使用固定种子的随机数，同样的参数和请求顺序得到同样的故障序列
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=0.1, seed=0):
+        """
+        :param latency: 每个请求的平均延迟秒数
+        :param jitter: 延迟的随机抖动幅度(秒)
+        :param error_rate: 返回500的比例
+        :param throttle_rate: 返回429的比例
+        :param retry_after: 429响应中Retry-After的秒数
+        :param seed: 随机种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.injected = {}
+
+    def apply(self):
+        """
+        在处理请求前调用：按配置等待，然后决定是否注入故障
+        :return: 要返回的故障状态码(429或500)，正常处理时返回None
+        """
+        with self._lock:
+            draw = self._random.random()
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        status = None
+        if draw < self.throttle_rate:
+            status = 429
+        elif draw < self.throttle_rate + self.error_rate:
+            status = 500
+        if status is not None:
+            with self._lock:
+                self.injected[status] = self.injected.get(status, 0) + 1
+        return status
+
+    def headers(self, status):
+        """
+        :return: 故障响应的额外响应头
+        """
+        if status == 429:
+            return {"Retry-After": f"{self.retry_after:g}", "retry-after-ms": str(int(self.retry_after * 1000))}
+        return {}
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """
+        给替身服务的命令行加上故障注入参数
+        """
+        parser.add_argument("--latency", type=float, default=0.0, help="每个请求的平均延迟秒数")
+        parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动幅度(秒)")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的比例")
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回429的比例")
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.latency, args.jitter, args.error_rate, args.throttle_rate)
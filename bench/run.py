@@ -0,0 +1,227 @@
+"""
+离线基准测试：在本地替身服务上测量获取、总结和渲染各阶段的吞吐、峰值内存和请求数
+用法: python -m bench.run --sizes 100 1000 10000 --latency 0.05 --throttle-rate 0.01
+每个阶段在独立的子进程中运行，输入由父进程预先生成，峰值内存只包含该阶段本身；
+--output 把结果保存为JSON，--baseline 与之前保存的结果比较，吞吐或峰值内存退化超过 --tolerance 时退出码为1
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import asyncio
+import tempfile
+import contextlib
+import multiprocessing
+import queue
+from bench import corpus, fake_arxiv, fake_openai
+from bench.faults import FaultInjector
+
+STAGES = ("fetch", "summarize", "render")
+
+
+def peak_rss():
+    """
+    :return: 当前进程的峰值常驻内存(字节)
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位是KB，macOS上是字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_fetch(workdir, size, options):
+    from ArxivFetcher import AsyncArxivFetcher
+    links = [corpus.link(arxiv_id, index) for index, arxiv_id in enumerate(corpus.synthetic_ids(size))]
+    fetcher = AsyncArxivFetcher(links, os.path.join(workdir, "abstracts.jsonl"), batch_size=options["batch_size"],
+                                max_concurrency=options["concurrency"], rate=options["arxiv_rate"],
+                                burst=options["concurrency"], api_url=options["arxiv_url"])
+    fetcher.fetch_and_store_abstracts()
+    papers = sum(1 for _, record in fetcher.processed_data.items() if "error" not in record)
+    fetcher.close()
+    return papers
+
+
+def run_summarize(workdir, size, options):
+    from ArxivReader import ArxivReader
+    reader = ArxivReader(os.path.join(workdir, "input_abstracts.jsonl"), os.path.join(workdir, "summaries.jsonl"),
+                         merge_calls=options["merge_calls"], pack_tokens=options["pack_tokens"])
+    try:
+        asyncio.run(reader.summarize_all())
+        return len(reader.output_data)
+    finally:
+        reader.close()
+
+
+def run_render(workdir, size, options):
+    from ArxivWriter import ArixvWriter
+    writer = ArixvWriter(os.path.join(workdir, "input_summaries.jsonl"))
+    markdown, csv_file = os.path.join(workdir, "papers.md"), os.path.join(workdir, "papers.csv")
+    if options["render_mode"] == "streaming":
+        writer.save_streaming(markdown, csv_file)
+    else:
+        writer.process_data()
+        writer.save_to_csv(csv_file)
+        writer.save_to_markdown(markdown)
+    return size
+
+
+RUNNERS = {"fetch": run_fetch, "summarize": run_summarize, "render": run_render}
+
+
+def prepare(stage, workdir, size):
+    """
+    在父进程中生成阶段的输入，并清除上一次运行的输出
+    """
+    for name in ("abstracts.jsonl", "summaries.jsonl", "input_abstracts.jsonl", "input_summaries.jsonl",
+                 "papers.md", "papers.csv"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(workdir, name))
+    if stage == "summarize":
+        corpus.write_abstracts(os.path.join(workdir, "input_abstracts.jsonl"), size)
+    elif stage == "render":
+        corpus.write_summaries(os.path.join(workdir, "input_summaries.jsonl"), size)
+
+
+def _child(stage, workdir, size, options, results):
+    # 子进程入口：config.yaml指向替身服务，各模块的print输出丢弃
+    os.environ["ARXIV_CONFIG"] = os.path.join(workdir, "config.yaml")
+    from utils.metrics import metrics
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        papers = RUNNERS[stage](workdir, size, options)
+        seconds = time.perf_counter() - start
+    results.put({"papers": papers, "seconds": seconds, "peak_rss": peak_rss(), "metrics": metrics.summary()})
+
+
+def _delta(after, before):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value - before.get(key, 0)}
+
+
+def run_stage(stage, workdir, size, options, servers):
+    """
+    在子进程中运行一个阶段
+    :param servers: 替身服务的状态字典 {"arxiv": state, "openai": state}
+    :return: 结果字典
+    """
+    prepare(stage, workdir, size)
+    before = {name: (dict(state.requests), dict(state.faults.injected)) for name, state in servers.items()}
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_child, args=(stage, workdir, size, options, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"Stage {stage} exited with code {process.exitcode}")
+    process.join()
+
+    requests, injected = {}, {}
+    for name, state in servers.items():
+        requests[name] = sum(_delta(state.requests, before[name][0]).values())
+        for status, count in _delta(state.faults.injected, before[name][1]).items():
+            injected[str(status)] = injected.get(str(status), 0) + count
+    counters = result["metrics"]["counters"]
+    return {"stage": stage, "size": size, "papers": result["papers"], "seconds": result["seconds"],
+            "papers_per_sec": result["papers"] / result["seconds"] if result["seconds"] else 0.0,
+            "peak_rss_mb": result["peak_rss"] / 2 ** 20, "requests": requests, "injected": injected,
+            "retries": counters.get("llm.retries", 0), "failures": counters.get("llm.failures", 0)}
+
+
+def report(results):
+    """
+    :return: 结果表格
+    """
+    lines = [f"{'stage':<11}{'size':>8}{'papers':>8}{'seconds':>9}{'papers/s':>10}{'RSS(MB)':>9}"
+             f"{'arxiv req':>11}{'llm req':>9}{'429':>6}{'5xx':>6}{'retries':>9}"]
+    for item in results:
+        lines.append(f"{item['stage']:<11}{item['size']:>8}{item['papers']:>8}{item['seconds']:>9.2f}"
+                     f"{item['papers_per_sec']:>10.1f}{item['peak_rss_mb']:>9.1f}"
+                     f"{item['requests'].get('arxiv', 0):>11}{item['requests'].get('openai', 0):>9}"
+                     f"{item['injected'].get('429', 0):>6}{item['injected'].get('500', 0):>6}{item['retries']:>9}")
+    return "\n".join(lines)
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基线结果比较
+    :param tolerance: 允许的相对退化比例
+    :return: 退化描述列表，为空表示没有退化
+    """
+    previous = {(item["stage"], item["size"]): item for item in baseline}
+    regressions = []
+    for item in results:
+        base = previous.get((item["stage"], item["size"]))
+        if base is None:
+            continue
+        if item["papers_per_sec"] < base["papers_per_sec"] * (1 - tolerance):
+            regressions.append(f"{item['stage']}@{item['size']}: {item['papers_per_sec']:.1f} papers/s "
+                               f"< baseline {base['papers_per_sec']:.1f}")
+        if item["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{item['stage']}@{item['size']}: peak RSS {item['peak_rss_mb']:.1f}MB "
+                               f"> baseline {base['peak_rss_mb']:.1f}MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线基准测试获取、总结和渲染各阶段")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="合成语料的论文数")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--workdir", help="工作目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--batch-size", type=int, default=100, help="每次arXiv API请求打包的ID数量")
+    parser.add_argument("--concurrency", type=int, default=8, help="arXiv API的最大并发请求数")
+    parser.add_argument("--arxiv-rate", type=float, default=1000.0, help="arXiv API每秒请求数上限")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="arXiv批量响应中随机缺失条目的比例")
+    parser.add_argument("--merge-calls", action="store_true", help="总结阶段一次调用同时完成总结和分类")
+    parser.add_argument("--pack-tokens", type=int, help="总结阶段打包分类的令牌预算")
+    parser.add_argument("--render-mode", choices=("full", "streaming"), default="full")
+    FaultInjector.add_arguments(parser)
+    parser.add_argument("--output", help="把结果保存为JSON")
+    parser.add_argument("--baseline", help="之前保存的JSON结果，用于检测退化")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对退化比例")
+    args = parser.parse_args(argv)
+
+    # 两个替身服务使用同样的故障参数，端口由系统分配
+    arxiv_server, arxiv_state = fake_arxiv.serve(port=0, faults=FaultInjector.from_args(args),
+                                                 missing_rate=args.missing_rate)
+    openai_server, openai_state = fake_openai.serve(port=0, faults=FaultInjector.from_args(args))
+    servers = {"arxiv": arxiv_state, "openai": openai_state}
+    options = {"batch_size": args.batch_size, "concurrency": args.concurrency, "arxiv_rate": args.arxiv_rate,
+               "arxiv_url": f"http://127.0.0.1:{arxiv_server.server_address[1]}/api/query",
+               "merge_calls": args.merge_calls, "pack_tokens": args.pack_tokens, "render_mode": args.render_mode}
+
+    results = []
+    with (contextlib.nullcontext(args.workdir) if args.workdir
+          else tempfile.TemporaryDirectory(prefix="arxiv-bench-")) as workdir:
+        os.makedirs(workdir, exist_ok=True)
+        with open(os.path.join(workdir, "config.yaml"), "w", encoding="utf-8") as file:
+            json.dump({"openai": {"api_key": "bench",
+                                  "base_url": f"http://127.0.0.1:{openai_server.server_address[1]}/v1"},
+                       "cache": False}, file)
+        try:
+            for size in args.sizes:
+                for stage in args.stages:
+                    results.append(run_stage(stage, workdir, size, options, servers))
+                    print(f"{stage} x {size}: {results[-1]['papers_per_sec']:.1f} papers/s", file=sys.stderr)
+        finally:
+            arxiv_server.shutdown()
+            openai_server.shutdown()
+
+    print(report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
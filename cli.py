@@ -0,0 +1,203 @@
+"""
+统一的命令行入口
+用法: python cli.py <子命令> [参数]，子命令见 python cli.py -h
+各子命令只在执行时导入自己需要的模块：scan、render和search不会读取config.yaml，也不会导入openai
+"""
+import sys
+import argparse
+import logging
+
+
+def cmd_scan(args):
+    from ArxivLinker import ArxivLinkScanner
+    scanner = ArxivLinkScanner(args.paths, workers=args.workers, manifest_path=args.manifest)
+    for link in scanner.iter_arxiv_pdf_links():
+        print(link)
+        if args.sources:
+            base = link.rsplit("/pdf/", 1)[1]
+            for path, line, version in scanner.sources[base]:
+                print(f"    {path}:{line}" + (f" (v{version})" if version else ""))
+    scanner.save_manifest()
+
+
+def cmd_fetch(args):
+    from ArxivLinker import ArxivLinkScanner
+    from ArxivFetcher import AsyncArxivFetcher
+    scanner = ArxivLinkScanner(args.paths, workers=args.workers, manifest_path=args.manifest)
+    links = scanner.extract_arxiv_pdf_links()
+    print(f"Found {len(links)} new arXiv links")
+    fetcher = AsyncArxivFetcher(links, args.storage, batch_size=args.batch_size)
+    fetcher.fetch_and_store_abstracts()
+    fetcher.close()
+    scanner.save_manifest()
+
+
+def cmd_summarize(args):
+    import asyncio
+    from ArxivReader import ArxivReader
+    reader = ArxivReader(args.input, args.output, model=args.model, merge_calls=args.merge_calls,
+                         pack_tokens=args.pack_tokens, local_classify=args.local_classify,
+                         near_dup_threshold=args.near_dup, search_index=args.search_index)
+    try:
+        asyncio.run(reader.summarize_batch() if args.batch else reader.summarize_all())
+    finally:
+        reader.close()
+
+
+def cmd_shard(args):
+    from ArxivSharder import ArxivSharder
+    sharder = ArxivSharder(args.input, args.output, shards=args.shards, shard_dir=args.shard_dir,
+                           lease_ttl=args.lease_ttl, search_index=args.search_index, model=args.model,
+                           merge_calls=args.merge_calls, pack_tokens=args.pack_tokens,
+                           local_classify=args.local_classify, near_dup_threshold=args.near_dup)
+    if args.action == "plan":
+        plan = sharder.plan()
+        print(f"{sum(plan['entries'])} entries in {plan['shards']} shards: {plan['entries']}")
+    elif args.action == "work":
+        print(f"Finished shards: {sharder.work(args.worker)}")
+    elif args.action == "status":
+        for shard, state in enumerate(sharder.status()):
+            print(f"shard {shard}: {state or 'unclaimed'}")
+    elif args.action == "merge":
+        print("Merged" if sharder.merge() else "Not all shards are finished")
+    else:
+        print("Merged" if sharder.run(args.workers) else "Not all shards are finished, rerun to resume")
+
+
+def cmd_render(args):
+    from ArxivWriter import ArixvWriter
+    writer = ArixvWriter(args.input)
+    if args.mode == "incremental":
+        writer.save_incremental(args.markdown, args.csv)
+    elif args.mode == "streaming":
+        writer.save_streaming(args.markdown, args.csv)
+    else:
+        writer.process_data()
+        if args.csv:
+            writer.save_to_csv(args.csv)
+        writer.save_to_markdown(args.markdown)
+
+
+def cmd_pipeline(args):
+    import asyncio
+    from ArxivPipeline import ArxivPipeline
+    pipeline = ArxivPipeline(args.path, abstracts_path=args.storage, summary_path=args.output,
+                             markdown_output=args.markdown, csv_output=args.csv, model=args.model,
+                             merge_calls=args.merge_calls, manifest_path=args.manifest,
+                             pack_tokens=args.pack_tokens, local_classify=args.local_classify,
+                             near_dup_threshold=args.near_dup, search_index=args.search_index)
+    asyncio.run(pipeline.run())
+
+
+def cmd_search(args):
+    from utils.search import SearchIndex
+    index = SearchIndex(args.index)
+    for rank, hit in enumerate(index.search(args.query, args.limit, args.method, args.paper_type,
+                                            args.since, args.until, match_all=not args.any), start=1):
+        print(f"{rank}. [{hit['year_month']}] [{hit['method']}/{hit['type']}] {hit['title']}\n   {hit['link']}")
+    index.close()
+
+
+def _add_reader_options(parser):
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--merge-calls", action="store_true", help="一次调用同时完成总结和分类")
+    parser.add_argument("--pack-tokens", type=int, help="打包分类的令牌预算")
+    parser.add_argument("--local-classify", action="store_true", help="先用本地分类器分类")
+    parser.add_argument("--near-dup", type=float, metavar="THRESHOLD", help="近似重复检测的相似度阈值")
+    parser.add_argument("--search-index", help="同时更新的全文索引文件")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="arXiv论文整理工具")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出INFO级别日志")
+    parser.add_argument("--metrics", metavar="FILE", help="把耗时、令牌用量等指标以JSONL追加到该文件")
+    parser.add_argument("--profile", metavar="DIR", help="用cProfile分析各阶段，结果保存到该目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="扫描文件或目录中的arXiv链接")
+    scan.add_argument("paths", nargs="+")
+    scan.add_argument("--manifest", help="扫描清单，指定时只输出新出现的论文")
+    scan.add_argument("--workers", type=int, help="工作进程数")
+    scan.add_argument("--sources", action="store_true", help="同时输出每篇论文出现的位置")
+    scan.set_defaults(func=cmd_scan)
+
+    fetch = commands.add_parser("fetch", help="扫描链接并获取摘要")
+    fetch.add_argument("paths", nargs="+")
+    fetch.add_argument("--storage", default="abstracts.json", help="摘要存储文件(JSON/JSONL/SQLite)")
+    fetch.add_argument("--manifest", help="扫描清单，指定时只获取新出现的论文")
+    fetch.add_argument("--workers", type=int, help="扫描的工作进程数")
+    fetch.add_argument("--batch-size", type=int, default=100, help="每次arXiv API请求打包的ID数量")
+    fetch.set_defaults(func=cmd_fetch)
+
+    summarize = commands.add_parser("summarize", help="调用LLM总结和分类摘要")
+    summarize.add_argument("--input", default="abstracts.json")
+    summarize.add_argument("--output", default="abstracts_summary.json")
+    summarize.add_argument("--batch", action="store_true", help="使用OpenAI Batch API离线处理")
+    _add_reader_options(summarize)
+    summarize.set_defaults(func=cmd_summarize)
+
+    shard = commands.add_parser("shard", help="多进程、多机器分片总结",
+                                description="run: 在本机分片并启动工作进程，完成后合并；多机器运行时先plan，"
+                                            "各机器执行 work --worker N，全部完成后merge")
+    shard.add_argument("action", choices=("run", "plan", "work", "status", "merge"))
+    shard.add_argument("--input", default="abstracts.json")
+    shard.add_argument("--output", default="abstracts_summary.json")
+    shard.add_argument("--shards", type=int, help="分片数，默认等于config.yaml中的端点数")
+    shard.add_argument("--shard-dir", help="分片目录，默认为 <output>.shards")
+    shard.add_argument("--workers", type=int, help="run时的工作进程数，默认等于分片数")
+    shard.add_argument("--worker", type=int, default=0, help="work时的工作进程编号，决定使用的端点")
+    shard.add_argument("--lease-ttl", type=float, default=60.0, help="租约有效秒数")
+    _add_reader_options(shard)
+    shard.set_defaults(func=cmd_shard)
+
+    render = commands.add_parser("render", help="生成Markdown和CSV")
+    render.add_argument("--input", default="abstracts_summary.json")
+    render.add_argument("--markdown", default="papers.md")
+    render.add_argument("--csv", default="papers.csv")
+    render.add_argument("--mode", choices=("full", "incremental", "streaming"), default="full")
+    render.set_defaults(func=cmd_render)
+
+    pipeline = commands.add_parser("pipeline", help="流式运行 扫描-获取-总结-渲染 全流程")
+    pipeline.add_argument("path", help="链接文件或目录")
+    pipeline.add_argument("--storage", default="abstracts.jsonl")
+    pipeline.add_argument("--output", default="abstracts_summary.jsonl")
+    pipeline.add_argument("--markdown", default="papers.md")
+    pipeline.add_argument("--csv", default="papers.csv")
+    pipeline.add_argument("--manifest", help="扫描清单，指定时只处理新出现的论文")
+    _add_reader_options(pipeline)
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    search = commands.add_parser("search", help="检索全文索引")
+    search.add_argument("query", nargs="?", default="")
+    search.add_argument("--index", default="papers_index.db")
+    search.add_argument("--method")
+    search.add_argument("--type", dest="paper_type")
+    search.add_argument("--since", help="起始年月(含)，如 2024-01")
+    search.add_argument("--until", help="结束年月(含)")
+    search.add_argument("--any", action="store_true", help="包含任一检索词即可")
+    search.add_argument("--limit", type=int, default=10)
+    search.set_defaults(func=cmd_search)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not (args.metrics or args.profile):
+        args.func(args)
+        return
+
+    from utils.metrics import metrics
+    metrics.configure(args.metrics, args.profile)
+    try:
+        args.func(args)
+    finally:
+        report = metrics.report()
+        if report:
+            print(report, file=sys.stderr)
+        metrics.write_summary()
+        metrics.close()
+
+
+if __name__ == "__main__":
+    main()
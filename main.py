@@ -1,27 +1,32 @@
-from ArxivLinker import ArxivLinkProcessor
-from ArxivFetcher import ArxivAbstractFetcher
+from ArxivLinker import ArxivLinkScanner
+from ArxivFetcher import AsyncArxivFetcher
 
 # 假设Markdown文件路径为example.md
 markdown_file_path = "link.md"
 # 使用摘要提取类
-storage_path = "abstracts.json"  # 或者使用 "abstracts.jsonl"
+storage_path = "abstracts.json"  # 或者使用 "abstracts.jsonl" / "papers.db"
+# 每次arXiv API请求打包的ID数量
+batch_size = 100
+# 扫描清单，记录链接文件的指纹和已处理的ID，重跑时只处理新追加的链接
+manifest_path = "links.manifest.json"
 
 
 def main():
-    # 初始化类并处理文件
-    processor = ArxivLinkProcessor(markdown_file_path)
+    # 初始化类并处理文件，只扫描上次运行后变化的部分
+    processor = ArxivLinkScanner(markdown_file_path, workers=1, manifest_path=manifest_path)
 
-    # 提取所有arXiv链接
-    links = processor.extract_arxiv_links()
-    print("提取到的arXiv链接:", links)
-
-    # 更新文件内容
+    # 提取新增的arXiv链接
     links = processor.extract_arxiv_pdf_links()
+    print("新增的arXiv链接:", links)
 
-    fetcher = ArxivAbstractFetcher(links, storage_path)
+    fetcher = AsyncArxivFetcher(links, storage_path, batch_size=batch_size)
 
     # 获取摘要并存储
     fetcher.fetch_and_store_abstracts()
+    fetcher.close()
+
+    # 摘要全部落盘后再记录清单
+    processor.save_manifest()
 
 
 if __name__ == "__main__":
@@ -11,7 +11,14 @@ SUMMARY_PROMPT = """
 使用中文。
 """
 
-CLASSIFY_PROMPT = """
+# 分类标签的合法取值，用于校验打包分类的结果
+CLASSIFY_METHODS = ["reason", "decision", "plan", "memory", "tool", "reward", "world_model", "device_operation",
+                    "robotics", "self_improvement", "multi_agent", "security", "other"]
+CLASSIFY_TYPES = ["textual_reasoning", "multimodal_reasoning", "textual_open_ended_tasks",
+                  "multimodal_open_ended_tasks", "theory", "survey", "benchmark", "other"]
+
+# 分类体系和标签格式，单篇分类和打包分类共用
+CLASSIFY_CATEGORIES = """
 **Method Category:**  
 - **Reason:** Focused on logical reasoning and problem-solving  
 - **Decision:** Focused on agents making choices between alternatives  
@@ -41,7 +48,9 @@ CLASSIFY_PROMPT = """
 Output Format:
 <method>[reason, decision, plan, memory, tool, reward, world_model, device_operation, robotics, self_improvement, multi_agent, security, other]</method>
 <type>[textual_reasoning, multimodal_reasoning, textual_open_ended_tasks, multimodal_open_ended_tasks, theory, survey, benchmark, other]</type>
+"""
 
+CLASSIFY_PROMPT = CLASSIFY_CATEGORIES + """
 Analyze the abstract and classify it:
 1. Key points (2-3 bullet points)
 2. Main innovation (1 sentence)
@@ -49,4 +58,24 @@ Analyze the abstract and classify it:
    <method>Select ONE</method>
    <type>Select ONE</type>
 Provide concise responses in English. Strictly adhere to the format.
-"""
\ No newline at end of file
+"""
+# 单次调用同时完成总结和分类，输出由 utils.response.extract_content 按标签解析
+COMBINED_PROMPT = """
+请完成以下两项任务。
+
+任务一：总结
+""" + SUMMARY_PROMPT + """
+任务二：分类
+""" + CLASSIFY_PROMPT + """
+Final Output Format (strictly follow, the summary in Chinese, everything else in English):
+<summary>任务一的总结</summary>
+<method>Select ONE</method>
+<type>Select ONE</type>
+"""
+# 一次请求分类多篇论文，论文用<paper id="N">包裹，按编号返回各自的标签
+PACKED_CLASSIFY_PROMPT = CLASSIFY_CATEGORIES + """
+Each paper above is wrapped in <paper id="N">...</paper>. Classify EVERY paper independently.
+For each paper output exactly one block, in the same order, and nothing else:
+<paper id="N"><method>Select ONE</method><type>Select ONE</type></paper>
+Use only the values listed in the Output Format. Strictly adhere to the format.
+"""
@@ -0,0 +1,102 @@
+import re
+from collections import namedtuple
+
+ArxivId = namedtuple("ArxivId", ["base", "version"])
+
+# 新格式 YYMM.NNNN(N)，旧格式 archive(.SC)/YYMMNNN，如 hep-th/9901001、math.AG/0601001
+ID_REGEX = (r'(?P<id>[0-9]{4}\.[0-9]{4,5}|[a-z]+(?:-[a-z]+)*(?:\.[A-Za-z]{2})?/[0-9]{7})'
+            r'(?:v(?P<version>[0-9]+))?')
+# 不含命名分组的版本，便于拼接到其他模式中用于findall
+ID_REGEX_PLAIN = re.sub(r'\(\?P<\w+>', '(?:', ID_REGEX)
+# 同时识别alphaxiv、ar5iv等镜像站的链接
+_URL_PATTERN = re.compile(r'(?:arxiv|alphaxiv|ar5iv)\.org/(?:abs|pdf|html|overview)/' + ID_REGEX + r'(?![0-9])',
+                          re.IGNORECASE)
+_BARE_PATTERN = re.compile(r'^(?:arxiv:\s*)?' + ID_REGEX + r'(?:\.pdf)?$', re.IGNORECASE)
+
+
+def _normalize(match):
+    base = match.group("id")
+    if "/" in base:
+        # 旧格式ID去掉学科子类，统一为小写的archive名
+        archive, number = base.split("/")
+        base = f"{archive.split('.')[0].lower()}/{number}"
+    version = match.group("version")
+    return ArxivId(base, int(version) if version else None)
+
+
+def parse_arxiv_id(text):
+    """
+    从链接、"arXiv:"前缀或裸ID中解析arXiv ID
+    :param text: 如 https://arxiv.org/pdf/2106.10356v2、arXiv:2106.10356、hep-th/9901001
+    :return: ArxivId(base, version)，无法识别时返回None
+    """
+    if not text:
+        return None
+    text = text.strip()
+    match = _URL_PATTERN.search(text) or _BARE_PATTERN.match(text)
+    return _normalize(match) if match else None
+
+
+def canonical_id(text):
+    """
+    :return: 不带版本号的基础ID，无法识别时返回None
+    """
+    arxiv_id = parse_arxiv_id(text)
+    return arxiv_id.base if arxiv_id else None
+
+
+def canonical_pdf_link(text):
+    """
+    :return: 规范化的pdf链接 https://arxiv.org/pdf/<基础ID>，无法识别时返回None
+    """
+    base = canonical_id(text)
+    return f"https://arxiv.org/pdf/{base}" if base else None
+
+
+class ArxivIdIndex:
+    """
+    基础ID到存储键的哈希索引，用于在链接、获取和总结各阶段按论文而不是按链接字符串去重
+    """
+
+    def __init__(self, keys=()):
+        """
+        :param keys: 已有的存储键(链接或ID)
+        """
+        self._index = {}
+        for key in keys:
+            self.add(key)
+
+    def add(self, key, base=None):
+        """
+        登记一个键，基础ID已登记时保留原来的键
+        :param key: 存储键
+        :param base: 基础ID，为None时从key中解析
+        :return: 是否为新论文
+        """
+        base = base or canonical_id(key)
+        if base is None or base in self._index:
+            return False
+        self._index[base] = key
+        return True
+
+    def get(self, text):
+        """
+        :param text: 链接或ID
+        :return: 同一论文已登记的存储键，没有时返回None
+        """
+        base = canonical_id(text)
+        return self._index.get(base) if base else None
+
+    def discard(self, text):
+        """
+        移除同一论文的登记，没有登记时忽略
+        """
+        base = canonical_id(text)
+        if base:
+            self._index.pop(base, None)
+
+    def __contains__(self, text):
+        return self.get(text) is not None
+
+    def __len__(self):
+        return len(self._index)
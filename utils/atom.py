@@ -0,0 +1,94 @@
+import re
+import xml.etree.ElementTree as ET
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+ARXIV_NS = "{http://arxiv.org/schemas/atom}"
+
+_ABS_ID_PATTERN = re.compile(r'arxiv\.org/abs/(.+?)(?:v([0-9]+))?$')
+
+
+class AtomFeedParser:
+    """
+    arXiv API返回的Atom Feed的增量解析器
+    数据可以分块喂入，每个<entry>结束时即产出一条记录并释放对应的元素，
+    整个文档只扫描一遍
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+
+    def feed(self, data):
+        """
+        喂入一段响应数据
+        :param data: bytes或str
+        :return: 本次解析完成的条目列表
+        """
+        self._parser.feed(data)
+        return list(self._drain())
+
+    def close(self):
+        """
+        结束解析
+        :return: 剩余未产出的条目列表
+        """
+        self._parser.close()
+        return list(self._drain())
+
+    def _drain(self):
+        for _, element in self._parser.read_events():
+            if element.tag == ATOM_NS + "entry":
+                yield parse_entry(element)
+                element.clear()
+
+
+def parse_entry(entry):
+    """
+    将<entry>元素转换为元数据字典
+    :param entry: <entry>元素
+    :return: 论文元数据字典
+    """
+    arxiv_id, version = None, None
+    id_match = _ABS_ID_PATTERN.search(entry.findtext(ATOM_NS + "id", "").strip())
+    if id_match:
+        arxiv_id = id_match.group(1)
+        version = int(id_match.group(2)) if id_match.group(2) else None
+
+    primary = entry.find(ARXIV_NS + "primary_category")
+    return {
+        "id": arxiv_id,
+        "version": version,
+        "title": _text(entry, ATOM_NS + "title"),
+        "abstract": _text(entry, ATOM_NS + "summary"),
+        "authors": [author.findtext(ATOM_NS + "name", "").strip()
+                    for author in entry.iter(ATOM_NS + "author")],
+        "categories": [category.get("term") for category in entry.iter(ATOM_NS + "category")],
+        "primary_category": primary.get("term") if primary is not None else None,
+        "published": _text(entry, ATOM_NS + "published"),
+        "updated": _text(entry, ATOM_NS + "updated"),
+        "doi": _text(entry, ARXIV_NS + "doi"),
+    }
+
+
+def _text(element, tag):
+    value = element.findtext(tag)
+    return value.strip() if value is not None else None
+
+
+def iter_entries(chunks):
+    """
+    逐块解析Feed并依次产出条目
+    :param chunks: bytes或str的可迭代对象
+    """
+    parser = AtomFeedParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def parse_feed(text):
+    """
+    解析完整的Feed文本
+    :param text: 响应文本
+    :return: 条目列表
+    """
+    return list(iter_entries([text]))
@@ -0,0 +1,98 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+
+class ResponseCache:
+    """
+    以请求内容哈希为键的LLM响应持久化缓存
+    键由(model, temperature, messages)计算，模型、参数或提示词任一变化都会得到新键，
+    未变化的请求在重跑时直接命中；条目数超过max_entries时按最近使用时间淘汰
+    """
+
+    def __init__(self, path="llm_cache.db", max_entries=100000):
+        """
+        :param path: SQLite缓存文件路径
+        :param max_entries: 最多保留的条目数
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses "
+                          "(key TEXT PRIMARY KEY, response TEXT NOT NULL, last_used REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self.conn.commit()
+        self._size = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        从config.yaml的cache段构建，cache: false 表示关闭缓存
+        :param config: 配置字典，None时使用默认参数
+        :return: 缓存实例或None
+        """
+        if config is False:
+            return None
+        return cls(**(config or {}))
+
+    @staticmethod
+    def make_key(model, temperature, messages):
+        payload = json.dumps({"model": model, "temperature": temperature, "messages": messages},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        查询缓存，命中时刷新最近使用时间
+        :param key: make_key生成的键
+        :return: 缓存的响应，未命中时返回None
+        """
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, response):
+        """
+        写入缓存，超过容量时淘汰最久未使用的条目
+        :param key: make_key生成的键
+        :param response: 响应文本
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO responses (key, response, last_used) VALUES (?, ?, ?)",
+                (key, response, time.time()))
+            self._size += cursor.rowcount
+            if self._size > self.max_entries:
+                # 一次淘汰到容量的90%，避免每次写入都触发淘汰
+                excess = self._size - int(self.max_entries * 0.9)
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,))
+                self._size -= excess
+                self.evictions += excess
+
+    def stats(self):
+        """
+        :return: 命中/未命中/淘汰次数、命中率和当前条目数
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "size": self._size,
+        }
+
+    def close(self):
+        self.conn.close()
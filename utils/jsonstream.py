@@ -0,0 +1,76 @@
+import json
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_object(path, chunk_size=1 << 16):
+    """
+    增量解析顶层为JSON对象的大文件，逐个产出(键, 值)，内存中只保留当前条目
+    :param path: JSON文件路径
+    :param chunk_size: 每次读取的字符数
+    :return: (键, 值)的生成器
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill(size):
+            # 丢弃已解析的部分并读入更多数据，返回是否读到了新数据
+            nonlocal buffer, pos, eof
+            chunk = file.read(size)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            return bool(chunk)
+
+        def next_char():
+            # 跳过空白，返回下一个字符(不消费)，文件结束时返回None
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill(chunk_size):
+                    return None
+
+        def decode():
+            # 解析一个完整的值；值后面必须还能看到下一个非空白字符，
+            # 否则像数字这样的值可能被数据块截断，需要读入更多数据再试
+            nonlocal pos
+            size = chunk_size
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    rest = end
+                    while rest < len(buffer) and buffer[rest] in _WHITESPACE:
+                        rest += 1
+                    if rest < len(buffer) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill(size)
+                size *= 2
+
+        if next_char() != "{":
+            raise ValueError(f"{path} 的顶层不是JSON对象")
+        pos += 1
+        while True:
+            char = next_char()
+            if char == "}":
+                return
+            if char == ",":
+                pos += 1
+                continue
+            if char is None:
+                raise ValueError(f"{path} 意外结束")
+            key = decode()
+            if next_char() != ":":
+                raise ValueError(f"{path} 在键 {key!r} 之后缺少冒号")
+            pos += 1
+            next_char()
+            yield key, decode()
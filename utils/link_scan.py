@@ -0,0 +1,157 @@
+import os
+import re
+import mmap
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from utils.arxiv_id import ID_REGEX_PLAIN, parse_arxiv_id
+
+Occurrence = namedtuple("Occurrence", ["path", "line", "version"])
+
+# Markdown、HTML、BibTeX和纯文本
+SCAN_EXTENSIONS = (".md", ".markdown", ".html", ".htm", ".bib", ".txt")
+# 超过该大小的文件用mmap扫描，不整体读入内存
+MMAP_THRESHOLD = 1 << 20
+
+# 每种写法只有一个捕获分组，匹配后用lastindex取出ID
+_SCAN_SOURCE = "|".join([
+    # arxiv.org及alphaxiv、ar5iv镜像的abs/pdf/html链接
+    r'(?:(?:www\.|export\.)?arxiv|(?:www\.)?alphaxiv|ar5iv(?:\.labs\.arxiv)?)\.org/(?:abs|pdf|html|overview)/'
+    r'(' + ID_REGEX_PLAIN + r')(?![0-9])',
+    # arXiv:2106.10356、arXiv:hep-th/9901001
+    r'\barxiv:\s*(' + ID_REGEX_PLAIN + r')(?![0-9])',
+    # arXiv分配的DOI 10.48550/arXiv.2106.10356
+    r'10\.48550/arxiv\.(' + ID_REGEX_PLAIN + r')(?![0-9])',
+    # BibTeX的 eprint = {2106.10356}
+    r'\beprint\s*=\s*[{"]\s*(' + ID_REGEX_PLAIN + r')(?![0-9])',
+    # 裸的新格式ID(月份为01-12)，前后不能紧挨路径或数字，避免误匹配普通数字和其他网站的路径
+    r'(?<![\w./-])([0-9]{2}(?:0[1-9]|1[0-2])\.[0-9]{4,5}(?:v[0-9]+)?)(?:\.pdf)?(?![\w/]|\.[0-9])',
+])
+SCAN_PATTERN = re.compile(_SCAN_SOURCE, re.IGNORECASE)
+_SCAN_PATTERN_BYTES = re.compile(_SCAN_SOURCE.encode("ascii"), re.IGNORECASE)
+
+
+def find_ids(text):
+    """
+    找出文本中以任意写法出现的arXiv ID
+    :param text: 文本
+    :return: ArxivId列表，按出现顺序，可能重复
+    """
+    return [parse_arxiv_id(match.group(match.lastindex)) for match in SCAN_PATTERN.finditer(text)]
+
+
+def _scan_buffer(buffer, start=0, end=None, line=1):
+    """
+    扫描bytes或mmap对象的[start, end)区间，行号随匹配位置增量计算
+    :param line: start处的行号
+    :return: (基础ID, 版本号, 行号)列表
+    """
+    end = len(buffer) if end is None else end
+    hits = []
+    last = start
+    for match in _SCAN_PATTERN_BYTES.finditer(buffer, start, end):
+        line += buffer[last:match.start()].count(b"\n")
+        last = match.start()
+        arxiv_id = parse_arxiv_id(match.group(match.lastindex).decode("ascii"))
+        hits.append((arxiv_id.base, arxiv_id.version, line))
+    return hits
+
+
+def _hash_range(digest, buffer, start, end, block=MMAP_THRESHOLD):
+    # 分块更新，避免对mmap整体切片时复制出整个文件
+    for offset in range(start, end, block):
+        digest.update(buffer[offset:min(offset + block, end)])
+    return digest
+
+
+def scan_file(path, previous=None):
+    """
+    扫描单个文件并计算指纹，大文件通过mmap读取；在工作进程中执行
+    previous为上次扫描的指纹时：大小和修改时间都没变则直接跳过；
+    已扫描部分的内容哈希未变(文件只是在末尾追加)时只从上次最后一行的开头扫描；否则整个文件重新扫描
+    :param path: 文件路径
+    :param previous: 上次扫描得到的指纹，为None时完整扫描
+    :return: (文件路径, [(基础ID, 版本号, 行号)], 指纹)
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    if previous and previous["size"] == size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return path, [], previous
+
+    with open(path, "rb") as file:
+        if size == 0:
+            buffer = b""
+        elif size < MMAP_THRESHOLD:
+            buffer = file.read(size)
+        else:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # 以stat得到的大小为准，扫描期间追加的内容留到下次
+            size = min(size, len(buffer))
+            start, line = 0, 1
+            digest = hashlib.sha256()
+            resumed = False
+            if previous and previous["size"] <= size:
+                _hash_range(digest, buffer, 0, previous["size"])
+                resumed = digest.hexdigest() == previous["sha256"]
+            if resumed:
+                start, line = previous["resume"], previous["line"]
+                _hash_range(digest, buffer, previous["size"], size)
+            else:
+                digest = _hash_range(hashlib.sha256(), buffer, 0, size)
+
+            hits = _scan_buffer(buffer, start, size, line)
+            # 最后一行可能还会被追加，下次从它的开头继续扫描
+            newline = buffer.rfind(b"\n", start, size)
+            resume = newline + 1 if newline >= 0 else start
+            fingerprint = {
+                "size": size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": digest.hexdigest(),
+                "resume": resume,
+                "line": line + buffer[start:resume].count(b"\n"),
+            }
+            return path, hits, fingerprint
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+
+def iter_files(paths, extensions=SCAN_EXTENSIONS):
+    """
+    展开文件和目录，目录递归查找指定扩展名的文件，跳过隐藏目录
+    :param paths: 文件或目录路径列表
+    :param extensions: 需要扫描的扩展名，为None时扫描所有文件
+    :return: 排好序的文件路径生成器，保证多次扫描的顺序一致
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            if not os.path.exists(path):
+                raise Exception(f"文件 {path} 未找到！")
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if extensions is None or name.lower().endswith(extensions):
+                    yield os.path.join(root, name)
+
+
+def scan_files(files, workers=None, chunksize=16, manifest=None):
+    """
+    并行扫描文件，结果按输入顺序产出
+    :param files: 文件路径列表
+    :param workers: 工作进程数，为None时使用CPU核数，小于等于1时在当前进程中扫描
+    :param chunksize: 每次分派给工作进程的文件数
+    :param manifest: 文件绝对路径到上次指纹的字典，为None时全部完整扫描
+    :return: (文件路径, [(基础ID, 版本号, 行号)], 指纹)的生成器
+    """
+    files = list(files)
+    manifest = manifest or {}
+    previous = [manifest.get(os.path.abspath(path)) for path in files]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(files) <= 1:
+        yield from map(scan_file, files, previous)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        yield from executor.map(scan_file, files, previous, chunksize=chunksize)
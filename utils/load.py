@@ -4,8 +4,8 @@ import os
 
 
 def load_llm():
-    # 读取上一级目录中的 YAML 配置文件
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+    # 读取上一级目录中的 YAML 配置文件，可用环境变量 ARXIV_CONFIG 指定其他路径(如基准测试)
+    config_path = os.environ.get('ARXIV_CONFIG') or os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
     with open(config_path, 'r') as file:
         config = yaml.safe_load(file)
 
@@ -0,0 +1,215 @@
+import re
+import zlib
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    :return: 小写的单词和相邻词对
+    """
+    words = _TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashingEmbedder:
+    """
+    基于特征哈希的本地文本向量，只依赖NumPy，在CPU上运行
+    词和词对哈希到固定维度，按次数的对数和IDF加权后做L2归一化，余弦相似度即点积
+    """
+
+    def __init__(self, dim=4096):
+        """
+        :param dim: 向量维度
+        """
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def sparse(self, text):
+        """
+        :return: (维度下标, 次数)，只包含文本中出现的维度
+        """
+        buckets = np.fromiter((zlib.crc32(token.encode("utf-8")) % self.dim for token in tokenize(text)),
+                              dtype=np.int32)
+        indices, counts = np.unique(buckets, return_counts=True)
+        return indices, counts.astype(np.float32)
+
+    def fit(self, rows):
+        """
+        根据语料计算各维度的IDF权重
+        :param rows: sparse()给出的稀疏行列表
+        """
+        document_frequency = np.zeros(self.dim, dtype=np.int64)
+        for indices, _ in rows:
+            document_frequency[indices] += 1
+        self.idf = (np.log((1 + len(rows)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def embed_rows(self, rows):
+        """
+        :param rows: 稀疏行列表
+        :return: (行数, dim)的归一化矩阵
+        """
+        vectors = np.zeros((len(rows), self.dim), dtype=np.float32)
+        for row, (indices, counts) in enumerate(rows):
+            vectors[row, indices] = np.log1p(counts) * self.idf[indices]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed(self, texts):
+        """
+        :param texts: 文本列表
+        :return: (文本数, dim)的归一化矩阵
+        """
+        return self.embed_rows([self.sparse(text) for text in texts])
+
+
+class CentroidClassifier:
+    """
+    最近质心分类器：每个标签的质心是已标注样本向量的归一化均值
+    置信度取最相似与次相似质心的差距，差距和最高相似度都达到阈值时才给出标签
+    """
+
+    def __init__(self, min_similarity=0.2, min_margin=0.05, min_examples=5):
+        """
+        :param min_similarity: 最相似质心的最低余弦相似度
+        :param min_margin: 最相似与次相似质心之间的最小差距
+        :param min_examples: 样本数少于该值的标签不建立质心
+        """
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.min_examples = min_examples
+        self.labels = []
+        self.centroids = None
+        self._sums, self._counts = {}, {}
+
+    def fit(self, vectors, labels):
+        """
+        :param vectors: (样本数, dim)的归一化矩阵
+        :param labels: 与样本对应的标签列表
+        """
+        self._sums, self._counts = {}, {}
+        self.partial_fit(vectors, labels)
+        return self.finish()
+
+    def partial_fit(self, vectors, labels):
+        """
+        累加一批样本，全部样本累加后调用finish计算质心，训练时不需要一次持有全部向量
+        :param vectors: (样本数, dim)的归一化矩阵
+        :param labels: 与样本对应的标签列表
+        """
+        labels = np.asarray(labels)
+        for label in set(labels.tolist()):
+            mask = labels == label
+            self._sums[label] = self._sums.get(label, 0.0) + vectors[mask].sum(axis=0)
+            self._counts[label] = self._counts.get(label, 0) + int(mask.sum())
+
+    def finish(self):
+        """
+        由累加的样本计算质心(归一化均值与归一化向量和方向相同)
+        """
+        self.labels = [label for label in sorted(self._sums) if self._counts[label] >= self.min_examples]
+        if not self.labels:
+            self.centroids = None
+        else:
+            centroids = np.stack([self._sums[label] for label in self.labels])
+            self.centroids = centroids / np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        self._sums, self._counts = {}, {}
+        return self
+
+    def predict(self, vectors):
+        """
+        :param vectors: (样本数, dim)的归一化矩阵
+        :return: 与样本对应的(标签, 置信度)列表，置信度不足时标签为None
+        """
+        if self.centroids is None or len(self.labels) < 2:
+            return [(None, 0.0)] * len(vectors)
+        similarities = vectors @ self.centroids.T
+        order = np.argsort(similarities, axis=1)
+        rows = np.arange(len(vectors))
+        best = similarities[rows, order[:, -1]]
+        margin = best - similarities[rows, order[:, -2]]
+        confident = (best >= self.min_similarity) & (margin >= self.min_margin)
+        return [(self.labels[index] if ok else None, float(gap))
+                for index, ok, gap in zip(order[:, -1], confident, margin)]
+
+
+class LocalClassifier:
+    """
+    用已分类论文训练的本地method/type分类器，两个标签都有把握时才跳过LLM，否则升级给LLM分类
+    """
+
+    def __init__(self, dim=4096, min_similarity=0.2, min_margin=0.05, min_examples=5, min_papers=50):
+        """
+        :param dim: 向量维度
+        :param min_similarity: 见CentroidClassifier
+        :param min_margin: 见CentroidClassifier
+        :param min_examples: 见CentroidClassifier
+        :param min_papers: 已分类论文少于该数量时不启用本地分类，全部交给LLM
+        """
+        self.embedder = HashingEmbedder(dim)
+        self.method = CentroidClassifier(min_similarity, min_margin, min_examples)
+        self.type = CentroidClassifier(min_similarity, min_margin, min_examples)
+        self.min_papers = min_papers
+        self.trained = 0
+        self.local = 0
+        self.escalated = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        从config.yaml的local_classifier段构建
+        :param config: 配置字典，None时使用默认参数
+        """
+        return cls(**(config or {}))
+
+    def fit(self, papers, text_of, methods, types, chunk_size=1024):
+        """
+        :param papers: 已分类的论文记录
+        :param text_of: 从记录得到用于分类的文本的函数
+        :param methods: 合法的method标签，只用标签合法的记录训练
+        :param types: 合法的type标签
+        :param chunk_size: 每次转换为稠密向量的论文数；其余论文只保存稀疏行，训练内存与dim×论文数无关
+        """
+        rows, labels = [], []
+        for paper in papers:
+            if isinstance(paper, dict) and paper.get("method") in methods and paper.get("type") in types:
+                rows.append(self.embedder.sparse(text_of(paper)))
+                labels.append((paper["method"], paper["type"]))
+        self.trained = len(rows)
+        if self.trained < self.min_papers:
+            return self
+        self.embedder.fit(rows)
+        for start in range(0, len(rows), chunk_size):
+            vectors = self.embedder.embed_rows(rows[start:start + chunk_size])
+            chunk = labels[start:start + chunk_size]
+            self.method.partial_fit(vectors, [method for method, _ in chunk])
+            self.type.partial_fit(vectors, [paper_type for _, paper_type in chunk])
+        self.method.finish()
+        self.type.finish()
+        return self
+
+    def classify(self, texts):
+        """
+        :param texts: 文本列表
+        :return: 与文本对应的(type, method)列表，没有把握的为None(需要升级给LLM)
+        """
+        if self.trained < self.min_papers:
+            results = [None] * len(texts)
+        else:
+            vectors = self.embedder.embed(texts)
+            results = [(classify_type, classify_method) if classify_type and classify_method else None
+                       for (classify_method, _), (classify_type, _)
+                       in zip(self.method.predict(vectors), self.type.predict(vectors))]
+        self.escalated += sum(result is None for result in results)
+        self.local += sum(result is not None for result in results)
+        return results
+
+    def stats(self):
+        """
+        :return: 训练样本数、本地分类数、升级数和升级率
+        """
+        total = self.local + self.escalated
+        return {"trained": self.trained, "local": self.local, "escalated": self.escalated,
+                "escalation_rate": self.escalated / total if total else 0.0}
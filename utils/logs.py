@@ -9,7 +9,8 @@ console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.DEBUG)
 
 # 创建文件处理器
-file_handler = logging.FileHandler('app.log')
+# delay=True: 第一次写入错误日志时才创建app.log，导入本模块没有副作用
+file_handler = logging.FileHandler('app.log', delay=True)
 file_handler.setLevel(logging.ERROR)
 
 # 创建格式器并将其添加到处理器
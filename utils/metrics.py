@@ -0,0 +1,209 @@
+import os
+import json
+import math
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# 每百万令牌的美元价格(输入, 输出)，可通过config.yaml的pricing段或Metrics.prices覆盖
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+
+def percentile(sorted_values, q):
+    """
+    最近秩法计算百分位数
+    :param sorted_values: 已排序的数值列表
+    :param q: 0-100
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class Metrics:
+    """
+    进程内的指标记录：阶段耗时、请求延迟分布、计数、令牌用量和估算费用
+    指定path时每条观测值以一行JSON追加到指标文件，结束时再写入一行汇总；
+    指定profile_dir时stage()会用cProfile分析该阶段并保存为 <profile_dir>/<阶段名>.prof
+    """
+
+    def __init__(self, path=None, profile_dir=None, prices=None):
+        """
+        :param path: JSONL指标文件路径，为None时只在内存中汇总
+        :param profile_dir: cProfile结果目录，为None时不做性能分析
+        :param prices: 模型价格表，默认使用MODEL_PRICES
+        """
+        self.prices = dict(MODEL_PRICES, **(prices or {}))
+        self._lock = threading.Lock()
+        self._file = None
+        self._profiling = False
+        self.configure(path, profile_dir)
+        self.reset()
+
+    def configure(self, path=None, profile_dir=None):
+        """
+        设置指标文件和性能分析目录，命令行入口在运行前调用
+        """
+        self.close()
+        self.path = path
+        self.profile_dir = profile_dir
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.latencies = {}
+            self.counters = {}
+            self.tokens = {}
+
+    def _emit(self, kind, name, **fields):
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"ts": time.time(), "kind": kind, "name": name, **fields},
+                                    ensure_ascii=False) + "\n")
+
+    def observe(self, name, seconds, **labels):
+        """
+        记录一次延迟
+        :param name: 指标名，如 llm.request、http.arxiv
+        :param seconds: 耗时秒数
+        """
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            self._emit("latency", name, seconds=seconds, **labels)
+
+    def count(self, name, value=1, **labels):
+        """
+        累加计数，如重试次数、缓存命中数
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self._emit("count", name, value=value, **labels)
+
+    def add_usage(self, model, prompt_tokens, completion_tokens):
+        """
+        记录一次LLM调用的令牌用量
+        """
+        with self._lock:
+            usage = self.tokens.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            self._emit("usage", model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def cost(self, model, usage):
+        """
+        :return: 估算费用(美元)，价格表中没有的模型按前缀匹配，仍找不到时返回None
+        """
+        price = self.prices.get(model)
+        if price is None:
+            # 带日期后缀的模型名(如 gpt-4o-mini-2024-07-18)按最长前缀匹配
+            matches = [name for name in self.prices if model.startswith(name)]
+            price = self.prices[max(matches, key=len)] if matches else None
+        if price is None:
+            return None
+        return (usage["prompt_tokens"] * price[0] + usage["completion_tokens"] * price[1]) / 1e6
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        计时一段代码并记录为延迟
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        记录一个阶段(获取、总结、渲染等)的总耗时，开启性能分析时同时用cProfile分析；
+        同一时间只能有一个cProfile在运行，嵌套的阶段只计时，由最外层阶段的分析结果覆盖
+        """
+        profiler = None
+        if self.profile_dir and not self._profiling:
+            self._profiling = True
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+                self._emit("stage", name, seconds=elapsed)
+
+    def summary(self):
+        """
+        :return: 汇总字典：各阶段耗时、延迟分布(次数/p50/p95/p99/最大值)、计数、令牌用量和费用
+        """
+        with self._lock:
+            latencies = {}
+            for name, values in self.latencies.items():
+                values = sorted(values)
+                latencies[name] = {"count": len(values), "p50": percentile(values, 50),
+                                   "p95": percentile(values, 95), "p99": percentile(values, 99),
+                                   "max": values[-1]}
+            tokens = {model: dict(usage, cost=self.cost(model, usage)) for model, usage in self.tokens.items()}
+            return {"stages": dict(self.stages), "latencies": latencies,
+                    "counters": dict(self.counters), "tokens": tokens}
+
+    def report(self):
+        """
+        :return: 便于阅读的汇总表，没有任何记录时返回空串
+        """
+        summary = self.summary()
+        if not any(summary.values()):
+            return ""
+        lines = []
+        if summary["stages"]:
+            lines.append(f"{'stage':<24}{'seconds':>10}")
+            lines += [f"{name:<24}{seconds:>10.2f}" for name, seconds in summary["stages"].items()]
+        if summary["latencies"]:
+            lines.append(f"{'latency':<24}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+            lines += [f"{name:<24}{item['count']:>8}{item['p50']:>9.3f}{item['p95']:>9.3f}"
+                      f"{item['p99']:>9.3f}{item['max']:>9.3f}" for name, item in summary["latencies"].items()]
+        if summary["counters"]:
+            lines.append(f"{'counter':<24}{'value':>10}")
+            lines += [f"{name:<24}{value:>10}" for name, value in summary["counters"].items()]
+        if summary["tokens"]:
+            lines.append(f"{'model':<24}{'calls':>8}{'prompt':>12}{'completion':>12}{'cost($)':>10}")
+            lines += [f"{model:<24}{usage['calls']:>8}{usage['prompt_tokens']:>12}{usage['completion_tokens']:>12}"
+                      f"{usage['cost'] if usage['cost'] is not None else float('nan'):>10.4f}"
+                      for model, usage in summary["tokens"].items()]
+        return "\n".join(lines)
+
+    def write_summary(self):
+        """
+        把汇总写入指标文件
+        """
+        summary = self.summary()
+        with self._lock:
+            self._emit("summary", "run", **summary)
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# 全进程共享的指标记录
+metrics = Metrics()
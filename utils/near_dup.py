@@ -0,0 +1,191 @@
+import re
+import zlib
+import itertools
+import numpy as np
+
+# 小于2^32的最大素数，保证 a*x+b 在uint64内不溢出
+_PRIME = np.uint64(4294967291)
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text, size=3):
+    """
+    :param text: 文本
+    :param size: 每个片段包含的词数
+    :return: 词级片段哈希值的去重数组
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams),
+                                 dtype=np.uint64, count=len(grams)))
+
+
+def _choose_bands(num_perm, threshold):
+    """
+    选择LSH的分段数，使低于阈值的论文成为候选的概率(误报)与高于阈值的论文漏掉的概率(漏报)的加权和最小；
+    误报只多一次签名比较，漏报则漏掉重复，因此漏报的权重更高
+    :return: (分段数, 每段行数)
+    """
+    similarity = np.linspace(0, 1, 201)
+    below, above = similarity <= threshold, similarity > threshold
+
+    def error(option):
+        bands, rows = option
+        candidate = 1 - (1 - similarity ** rows) ** bands
+        return (0.2 * candidate[below].mean() * threshold
+                + 0.8 * (1 - candidate[above]).mean() * (1 - threshold))
+
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    return min(options, key=error)
+
+
+class NearDuplicateIndex:
+    """
+    基于MinHash和LSH分段的近似重复检测
+    每篇论文的MinHash签名按段哈希分桶，只有至少一段完全相同的论文才比较签名，
+    比较次数与论文数近似线性；估计的Jaccard相似度达到阈值即视为近似重复，用并查集聚成簇
+    """
+
+    def __init__(self, threshold=0.8, num_perm=120, shingle_size=3, seed=1):
+        """
+        :param threshold: 判为近似重复的Jaccard相似度阈值
+        :param num_perm: MinHash签名长度
+        :param shingle_size: 片段包含的词数
+        :param seed: 哈希函数的随机种子，同一索引内必须固定
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}
+        self._parent = {}
+        self._order = {}
+        # 加入顺序的单调计数，移除论文后也不会重复
+        self._counter = itertools.count()
+        # 有重复的簇的代表键 -> 簇内所有论文键(含代表)，移除论文时只需遍历所在簇
+        self._members = {}
+
+    def signature(self, text):
+        """
+        :return: MinHash签名，文本没有可用的词时返回None
+        """
+        values = shingles(text, self.shingle_size) % _PRIME
+        if values.size == 0:
+            return None
+        return ((self._a * values[None, :] + self._b) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [hash(signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def find(self, key):
+        """
+        :return: 所在簇的代表键(最先加入的论文)
+        """
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+        return root
+
+    def add(self, key, text):
+        """
+        加入一篇论文并与已有论文比较
+        :param key: 论文键
+        :param text: 标题和摘要
+        :return: 近似重复时返回所在簇的代表键，否则返回None
+        """
+        if key in self._parent:
+            root = self.find(key)
+            return root if root != key else None
+        self._parent[key] = key
+        self._order[key] = next(self._counter)
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        band_keys = self._band_keys(signature)
+        candidates = {other for band, band_key in enumerate(band_keys)
+                      for other in self._buckets[band].get(band_key, ())}
+        match = None
+        for other in candidates:
+            if np.mean(self._signatures[other] == signature) >= self.threshold:
+                root = self.find(other)
+                if match is None:
+                    match = root
+                elif root != match:
+                    # 新论文同时连接了两个簇，合并到较早加入的代表
+                    early, late = sorted((root, match), key=self._order.get)
+                    self._parent[late] = early
+                    self._members.setdefault(early, [early]).extend(self._members.pop(late, [late]))
+                    match = early
+        self._signatures[key] = signature
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, []).append(key)
+        if match is not None:
+            self._parent[key] = match
+            self._members.setdefault(match, [match]).append(key)
+        return match
+
+    def remove(self, key):
+        """
+        移除一篇论文(如处理失败的代表论文)，其所在簇改由剩余论文中最先加入的一篇代表
+        :param key: 论文键
+        :return: 簇的代表键，簇中没有其他论文时返回None
+        """
+        if key not in self._parent:
+            return None
+        root = self.find(key)
+        members = [other for other in self._members.pop(root, [root]) if other != key]
+        signature = self._signatures.pop(key, None)
+        if signature is not None:
+            for band, band_key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band][band_key]
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+        del self._parent[key]
+        del self._order[key]
+        if not members:
+            return None
+        if root == key:
+            root = min(members, key=self._order.get)
+        # 簇内可能有论文经由被移除的键指向代表，全部直接指向代表
+        for other in members:
+            self._parent[other] = root
+        if len(members) > 1:
+            self._members[root] = members
+        return root
+
+    def clusters(self):
+        """
+        :return: 代表键到簇内其他论文键列表的字典，只包含有重复的簇
+        """
+        clusters = {}
+        for key in self._parent:
+            root = self.find(key)
+            if root != key:
+                clusters.setdefault(root, []).append(key)
+        return clusters
+
+    def __len__(self):
+        return len(self._parent)
+
+
+def find_near_duplicates(papers, **options):
+    """
+    对一批论文做近似重复聚类
+    :param papers: (键, 标题和摘要)的可迭代对象
+    :param options: 传给NearDuplicateIndex的参数
+    :return: 代表键到簇内其他论文键列表的字典
+    """
+    index = NearDuplicateIndex(**options)
+    for key, text in papers:
+        index.add(key, text)
+    return index.clusters()
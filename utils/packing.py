@@ -0,0 +1,81 @@
+import asyncio
+
+
+class RequestPacker:
+    """
+    把并发提交的小请求打包成一次调用
+    累计的令牌数超过预算或条目数达到上限时立即发出，否则等待linger秒后把已有的条目发出，
+    每个提交者等待自己那一项的结果
+    """
+
+    def __init__(self, dispatch, budget, overhead=0, linger=0.5, max_items=50):
+        """
+        :param dispatch: 异步函数，接受条目列表，返回与之一一对应的结果列表
+        :param budget: 每次打包调用的令牌预算
+        :param overhead: 每次调用的固定令牌开销(如共用的提示词)
+        :param linger: 未满的包最多等待的秒数
+        :param max_items: 每包最多的条目数
+        """
+        self.dispatch = dispatch
+        self.budget = budget
+        self.overhead = overhead
+        self.linger = linger
+        self.max_items = max_items
+        self.packs = 0
+        self.items = 0
+        self._pending = []
+        self._tokens = overhead
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item, tokens):
+        """
+        提交一个条目，单个条目超过预算时单独成包
+        :param item: 条目
+        :param tokens: 条目的估计令牌数
+        :return: dispatch为该条目返回的结果
+        """
+        if self._pending and (self._tokens + tokens > self.budget or len(self._pending) >= self.max_items):
+            self.flush()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._tokens += tokens
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.linger, self.flush)
+        return await future
+
+    def flush(self):
+        """
+        立即发出当前的包
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pack, self._pending, self._tokens = self._pending, [], self.overhead
+        task = asyncio.get_running_loop().create_task(self._run(pack))
+        # 保留任务引用，避免运行中被回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pack):
+        self.packs += 1
+        self.items += len(pack)
+        try:
+            results = await self.dispatch([item for item, _ in pack])
+        except Exception as e:
+            for _, future in pack:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pack, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        """
+        :return: 已发出的包数、条目数和平均每包条目数
+        """
+        return {"packs": self.packs, "items": self.items,
+                "items_per_pack": self.items / self.packs if self.packs else 0.0}
@@ -0,0 +1,124 @@
+import json
+from utils.storage import SqliteStorage
+from utils.arxiv_id import canonical_id
+
+# 从记录中抽取并建立索引的列
+INDEXED_COLUMNS = ("arxiv_id", "published", "method", "type")
+
+
+class PaperStore(SqliteStorage):
+    """
+    整条流水线共用的SQLite论文库
+    每个阶段一张表(fetcher写abstracts，reader写summaries)，除JSON记录外
+    还抽取arXiv ID、发表日期、方法和类型列并建立索引，
+    断点续跑的存在性检查和writer的按类别切片都走索引查询
+    """
+
+    def __init__(self, path, table="papers", flush_every=1, flush_interval=None):
+        super().__init__(path, table, flush_every, flush_interval)
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        added = [column for column in INDEXED_COLUMNS if column not in existing]
+        for column in added:
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+        if "version" not in existing:
+            # 写入序号，每次插入或更新时递增，writer据此增量读取新增和更新的记录
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER")
+            self.conn.execute(f"UPDATE {table} SET version = rowid")
+        if added:
+            # 旧版键值表升级后回填索引列
+            rows = self.conn.execute(f"SELECT key, value FROM {table}").fetchall()
+            self.conn.executemany(
+                f"UPDATE {table} SET arxiv_id = ?, published = ?, method = ?, type = ? WHERE key = ?",
+                [self._columns(json.loads(value)) + (key,) for key, value in rows])
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_arxiv_id ON {table} (arxiv_id)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_published ON {table} (published)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_method_type ON {table} (method, type)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_type ON {table} (type)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_version ON {table} (version)")
+        self.conn.commit()
+
+    @staticmethod
+    def _columns(value):
+        """
+        从记录中抽取索引列
+        :param value: 论文记录
+        :return: (arxiv_id, published, method, type)
+        """
+        if not isinstance(value, dict):
+            return None, None, "", ""
+        arxiv_id = canonical_id(value.get("id")) or value.get("id")
+        if value.get("duplicate_of"):
+            # 近似重复的占位记录不属于任何类别，分类列存NULL
+            return arxiv_id, value.get("published"), None, None
+        # 缺失的分类存为空串，保证可以按"未分类"切片查询
+        return arxiv_id, value.get("published"), value.get("method") or "", value.get("type") or ""
+
+    def _write(self, records):
+        # 使用UPSERT而不是REPLACE，保留rowid以维持论文的首次写入顺序
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {self.table} (key, value, arxiv_id, published, method, type, version) "
+                f"VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(version), 0) + 1 FROM {self.table})) "
+                f"ON CONFLICT(key) DO UPDATE SET "
+                f"value = excluded.value, arxiv_id = excluded.arxiv_id, published = excluded.published, "
+                f"method = excluded.method, type = excluded.type, version = excluded.version",
+                [(key, json.dumps(value, ensure_ascii=False)) + self._columns(value)
+                 for key, value in records.items()])
+
+    def items(self):
+        self.flush()
+        for key, value in self.conn.execute(f"SELECT key, value FROM {self.table} ORDER BY rowid"):
+            yield key, json.loads(value)
+
+    def items_after(self, version):
+        """
+        逐条产出写入序号大于给定值的记录，用于增量读取新写入和更新的论文
+        :param version: 上次读取到的写入序号
+        :return: (写入序号, 键, 记录)的生成器
+        """
+        self.flush()
+        for row_version, key, value in self.conn.execute(
+                f"SELECT version, key, value FROM {self.table} WHERE version > ? ORDER BY version", (version,)):
+            yield row_version, key, json.loads(value)
+
+    def find_by_arxiv_id(self, arxiv_id):
+        """
+        按arXiv ID查找记录，同一论文的所有版本都会返回
+        :param arxiv_id: arXiv ID或链接
+        :return: (键, 记录)列表
+        """
+        arxiv_id = canonical_id(arxiv_id) or arxiv_id
+        self.flush()
+        rows = self.conn.execute(
+            f"SELECT key, value FROM {self.table} WHERE arxiv_id = ? ORDER BY rowid", (arxiv_id,))
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def query(self, method=None, paper_type=None, since=None, until=None):
+        """
+        按条件逐条产出记录，按写入顺序排列
+        :param method: 方法类别
+        :param paper_type: 论文类型
+        :param since: 发表日期下界(含)，ISO格式字符串
+        :param until: 发表日期上界(不含)，ISO格式字符串
+        """
+        self.flush()
+        conditions, params = [], []
+        for column, operator, value in (("method", "=", method), ("type", "=", paper_type),
+                                        ("published", ">=", since), ("published", "<", until)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        for key, value in self.conn.execute(
+                f"SELECT key, value FROM {self.table}{where} ORDER BY rowid", params):
+            yield key, json.loads(value)
+
+    def categories(self):
+        """
+        列出所有(方法, 类型)组合及论文数，按组合首次出现的顺序排列；近似重复的占位记录不计入
+        :return: (method, type, count)列表
+        """
+        self.flush()
+        return self.conn.execute(
+            f"SELECT method, type, COUNT(*) FROM {self.table} WHERE method IS NOT NULL "
+            f"GROUP BY method, type ORDER BY MIN(rowid)").fetchall()
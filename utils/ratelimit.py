@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    异步令牌桶限速器
+    以固定速率补充令牌，桶满后多余的令牌丢弃；acquire在令牌不足时异步等待
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量，即允许的最大突发请求数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = None
+        self._loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        """
+        获取令牌，不足时等待补充
+        :param tokens: 需要的令牌数
+        """
+        # 加锁保证等待中的请求按先来后到取得令牌；锁绑定事件循环，多次asyncio.run时按循环重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
@@ -2,42 +2,211 @@ import csv
 import os
 import re
 import json
+import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from openai import OpenAI
-import time
+import asyncio
 from utils import load
-
-
-config = load.load_llm()
-# 初始化 OpenAI 客户端
-client = OpenAI(api_key=config['openai']['api_key'],
-                base_url=config['openai']['base_url'])
+from utils.scheduler import AdaptiveLimiter, backoff_delay, retry_after
+from utils.cache import ResponseCache
+from utils.metrics import metrics
+from utils.router import Router, NoEndpointError, error_code
+
+# 配置、客户端、调度器和缓存都在第一次使用时才创建：
+# 不调用LLM的命令(渲染、扫描链接等)导入本模块时不读取config.yaml，也不导入openai
+_UNSET = object()
+_config = None
+_client = None
+_scheduler = None
+_router = None
+# cache: false 时缓存为None，用哨兵区分"尚未创建"
+_response_cache = _UNSET
+
+# 可重试的HTTP状态码：请求超时和冲突
+RETRYABLE_STATUS = (408, 409)
+
+
+def get_config():
+    """
+    :return: config.yaml的内容，首次调用时读取
+    """
+    global _config
+    if _config is None:
+        _config = load.load_llm()
+        # pricing段: {模型名: [输入价格, 输出价格]}，单位为美元/百万令牌
+        metrics.prices.update({model: tuple(price) for model, price in (_config.get('pricing') or {}).items()})
+    return _config
+
+
+def get_client():
+    """
+    :return: 共享的异步OpenAI客户端，请求期间不阻塞事件循环，并发调用共享连接池；
+             不在SDK内部重试，429和5xx直接交给responser和调度器处理
+    """
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        config = get_config()
+        _client = AsyncOpenAI(api_key=config['openai']['api_key'],
+                              base_url=config['openai']['base_url'], max_retries=0)
+    return _client
+
+
+def get_scheduler():
+    """
+    :return: 所有请求共享的自适应并发调度器，参数见config.yaml的scheduler段
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = AdaptiveLimiter.from_config(get_config().get('scheduler'))
+    return _scheduler
+
+
+def get_router():
+    """
+    :return: 所有请求共享的端点路由器；没有endpoints段时只有openai段一个端点，使用共享的客户端和调度器，
+             参数见config.yaml的endpoints段和router段
+    """
+    global _router
+    if _router is None:
+        config = get_config()
+        if config.get('endpoints'):
+            _router = Router.from_config(config)
+        else:
+            _router = Router.from_config(config, default_limiter=get_scheduler(), default_client=get_client())
+    return _router
+
+
+def get_response_cache():
+    """
+    :return: 按请求内容哈希的响应缓存，参数见config.yaml的cache段，cache: false 时返回None
+    """
+    global _response_cache
+    if _response_cache is _UNSET:
+        _response_cache = ResponseCache.from_config(get_config().get('cache'))
+    return _response_cache
+
+
+def get_endpoints():
+    """
+    :return: config.yaml的endpoints段中的端点列表(每项包含api_key，可选base_url和scheduler)，
+             没有该段时只有openai段一个端点
+    """
+    config = get_config()
+    return config.get('endpoints') or [config['openai']]
+
+
+def use_endpoint(index):
+    """
+    让本进程只使用第index个端点(按端点数取模)，分片总结时每个工作进程使用各自的API密钥和限流配置
+    :param index: 端点编号，通常为工作进程编号
+    :return: 选中的端点
+    """
+    global _client, _scheduler, _router
+    endpoints = get_endpoints()
+    endpoint = endpoints[index % len(endpoints)]
+    config = get_config()
+    config['openai'] = dict(config['openai'], **{key: endpoint[key] for key in ('api_key', 'base_url')
+                                                 if key in endpoint})
+    if 'scheduler' in endpoint:
+        config['scheduler'] = endpoint['scheduler']
+    config.pop('endpoints', None)
+    _client = None
+    _scheduler = None
+    _router = None
+    return endpoint
+
+
+def __getattr__(name):
+    # 兼容以前的模块级属性 config/client/scheduler/response_cache
+    getters = {"config": get_config, "client": get_client, "scheduler": get_scheduler,
+               "router": get_router, "response_cache": get_response_cache}
+    if name in getters:
+        return getters[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _retryable_errors():
+    # 可重试的错误：超时、连接错误和服务端5xx
+    import openai
+    return openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError
 
 
 # 假设你有一个用于生成模型响应的函数
-async def responser(messages, model, temperature=0.3, max_tokens=4096, max_retries=10):
-    retries = 0
-    while retries < max_retries:
+async def responser(messages, model, temperature=0.3, max_tokens=4096, max_retries=10, limiter=None):
+    """
+    通过端点路由器调用LLM，失败时换到其他端点重试，没有可接手的端点时按退避等待
+    :param limiter: 指定时替代各端点自己的调度器
+    :return: 响应文本，失败时返回None
+    """
+    import openai
+    router = get_router()
+    failed = set()
+    for attempt in range(max_retries):
+        if attempt:
+            metrics.count("llm.retries", model=model)
         try:
-            # 调用 OpenAI API 生成回答
-            completion = client.chat.completions.create(
-                model=model,
-                temperature=temperature,
-                messages=messages,
-                max_tokens=max_tokens
-            )
+            completion = await router.complete(messages, model, limiter=limiter, avoid=failed,
+                                               temperature=temperature, max_tokens=max_tokens)
+            if completion.usage is not None:
+                metrics.add_usage(model, completion.usage.prompt_tokens, completion.usage.completion_tokens)
 
             response = completion.choices[0].message.content
             return response
-        except Exception as e:
-            print(f"Error occurred: {e}. Retrying... ({retries+1}/{max_retries})")
-            retries += 1
-            time.sleep(5)
+        except NoEndpointError as e:
+            # 所有端点都已停用，调用方可通过router.usable(model)判断是否应停止
+            print(f"Fatal error: {e}")
+            metrics.count("llm.failures", model=model)
+            return None
+        except openai.RateLimitError as e:
+            error = e
+            # 额度用尽的端点已被停用，其他端点都不可用时放弃
+            if error_code(e) == "insufficient_quota" and not router.can_failover(model):
+                print(f"Fatal error: {e}")
+                metrics.count("llm.failures", model=model)
+                return None
+            delay = (retry_after(e.response.headers) or backoff_delay(attempt)) + random.uniform(0, 1)
+        except _retryable_errors() as e:
+            error = e
+            delay = backoff_delay(attempt)
+        except openai.APIStatusError as e:
+            error = e
+            if e.status_code not in RETRYABLE_STATUS:
+                print(f"Fatal error: {e}")
+                metrics.count("llm.failures", model=model)
+                return None
+            delay = backoff_delay(attempt)
+        if router.can_failover(model, failed):
+            # 还有未失败过的端点可以立即接手
+            delay = 0
+        print(f"Error occurred: {error}. Retrying in {delay:.1f}s... ({attempt+1}/{max_retries})")
+        await asyncio.sleep(delay)
 
     print("Max retries reached. Failed to get a response.")
+    metrics.count("llm.failures", model=model)
     return None
 
 
+async def cached_responser(messages, model, temperature=0.3, cache=None, **kwargs):
+    """
+    带响应缓存的responser，相同(model, temperature, messages)的请求只调用一次LLM
+    :param cache: ResponseCache实例，默认使用全局的response_cache
+    :return: 响应文本，失败时返回None(失败结果不写入缓存)
+    """
+    cache = cache or get_response_cache()
+    if cache is None:
+        return await responser(messages, model, temperature=temperature, **kwargs)
+
+    key = cache.make_key(model, temperature, messages)
+    response = cache.get(key)
+    if response is not None:
+        metrics.count("llm.cache_hits")
+        return response
+    response = await responser(messages, model, temperature=temperature, **kwargs)
+    if response is not None:
+        cache.put(key, response)
+    return response
+
+
 def extract_content(xml_string, tag):
     # 构建正则表达式，匹配指定的标签内容
     pattern = rf'<{tag}>(.*?)</{tag}>'
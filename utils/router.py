@@ -0,0 +1,323 @@
+import time
+import random
+import asyncio
+from collections import deque
+from utils.metrics import metrics, percentile
+from utils.scheduler import AdaptiveLimiter, retry_after, estimate_tokens
+
+
+class NoEndpointError(RuntimeError):
+    """
+    没有可用于该模型的端点(都因额度用尽被停用，或没有端点提供该模型)，重试也无法恢复
+    """
+
+
+class Endpoint:
+    """
+    一个LLM端点：客户端、并发调度器(即该端点的配额)、权重和熔断器
+    熔断器在连续失败failure_threshold次后打开，cooldown秒内不再分配请求；
+    冷却结束后放行一个探测请求(半开)，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name, api_key=None, base_url=None, weight=1.0, models=None, limiter=None, client=None,
+                 timeout=None, failure_threshold=5, cooldown=30.0):
+        """
+        :param name: 端点名，用于日志和指标
+        :param api_key: API密钥
+        :param base_url: API地址
+        :param weight: 权重，越大分到的请求越多
+        :param models: 请求的模型名到该端点模型名的映射，指定时该端点只处理映射中的模型
+        :param limiter: 该端点的AdaptiveLimiter，其rpm/tpm/maximum即端点的配额
+        :param client: 已创建的AsyncOpenAI客户端，为None时第一次使用时创建(不在SDK内部重试，失败立即交给路由器)
+        :param timeout: 单次请求超时秒数
+        :param failure_threshold: 打开熔断器的连续失败次数
+        :param cooldown: 熔断器打开的秒数
+        """
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.weight = weight
+        self.models = models
+        self.limiter = limiter or AdaptiveLimiter()
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.disabled = False
+        self._client = client
+        self._probing = False
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            options = {"timeout": self.timeout} if self.timeout else {}
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, **options)
+        return self._client
+
+    def serves(self, model):
+        return self.models is None or model in self.models
+
+    def model_for(self, model):
+        return self.models.get(model, model) if self.models else model
+
+    @property
+    def state(self):
+        if self.disabled:
+            return "disabled"
+        if self.opened_until == 0.0:
+            return "closed"
+        # 冷却期间，或冷却结束后唯一的探测请求仍在途时为打开
+        return "open" if time.monotonic() < self.opened_until or self._probing else "half_open"
+
+    def available(self):
+        """
+        :return: 熔断器是否允许分配新请求
+        """
+        return self.state in ("closed", "half_open")
+
+    def paused(self):
+        """
+        :return: 调度器是否因限流正在暂停
+        """
+        return self.limiter.paused_for() > 0
+
+    def on_dispatch(self):
+        """
+        :return: 该请求是否为半开状态的探测请求，请求结束时需传给on_done
+        """
+        probe = self.state == "half_open"
+        if probe:
+            self._probing = True
+        self.outstanding += 1
+        self.requests += 1
+        return probe
+
+    def on_success(self):
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+
+    def on_failure(self, probe=False):
+        """
+        :param probe: 失败的是否为探测请求，探测失败时重新打开熔断器
+        """
+        self.failures += 1
+        self.consecutive_failures += 1
+        # 熔断期间陆续返回的在途请求失败不延长冷却时间
+        opened = self.opened_until > time.monotonic()
+        if probe or (not opened and self.consecutive_failures >= self.failure_threshold):
+            metrics.count("llm.breaker_open", endpoint=self.name)
+            self.opened_until = time.monotonic() + self.cooldown
+
+    def on_done(self, probe=False):
+        """
+        请求结束(成功、失败、限流、其他错误或对冲中被取消)时调用，探测请求结束后交还探测名额；
+        限流和取消不计为失败，熔断器回到半开，下一个请求再探测
+        """
+        self.outstanding -= 1
+        if probe:
+            self._probing = False
+
+    def disable(self):
+        """
+        额度用尽(insufficient_quota)时永久停用该端点
+        """
+        self.disabled = True
+
+    def stats(self):
+        return {"state": self.state, "requests": self.requests, "failures": self.failures,
+                "outstanding": self.outstanding, "limit": round(self.limiter.limit, 1)}
+
+
+class Router:
+    """
+    多端点LLM请求路由：按权重做最少在途请求的负载均衡，熔断失败的端点，
+    请求耗时超过对冲延迟时向另一个端点发送对冲请求，取先成功的结果并取消另一个
+    """
+
+    def __init__(self, endpoints, hedge_after=None, hedge_percentile=95, hedge_budget=0.1, min_samples=20):
+        """
+        :param endpoints: Endpoint列表
+        :param hedge_after: 对冲延迟秒数；为"auto"时取最近请求耗时的hedge_percentile分位数；None表示不对冲
+        :param hedge_percentile: 自动对冲延迟使用的分位数
+        :param hedge_budget: 对冲请求数占请求总数的上限比例
+        :param min_samples: 自动对冲前至少需要的耗时样本数
+        """
+        if not endpoints:
+            raise ValueError("Router needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedge_after = hedge_after
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=500)
+
+    @classmethod
+    def from_config(cls, config, default_limiter=None, default_client=None):
+        """
+        从config.yaml构建：endpoints段的每一项继承openai段的api_key/base_url，可指定name、weight、models、
+        timeout和scheduler(该端点的配额，默认使用全局scheduler段)；router段为熔断和对冲参数
+        :param config: 配置字典
+        :param default_limiter: 没有endpoints段时唯一端点使用的调度器
+        :param default_client: 没有endpoints段时唯一端点使用的客户端
+        """
+        options = dict(config.get('router') or {})
+        breaker = {key: options.pop(key) for key in ("failure_threshold", "cooldown") if key in options}
+        if not config.get('endpoints'):
+            return cls([Endpoint("openai", limiter=default_limiter, client=default_client, **breaker)], **options)
+        endpoints = []
+        for index, item in enumerate(config['endpoints']):
+            item = dict(config['openai'], **item)
+            endpoints.append(Endpoint(item.get('name') or f"endpoint{index}", item.get('api_key'),
+                                      item.get('base_url'), weight=item.get('weight', 1.0),
+                                      models=item.get('models'), timeout=item.get('timeout'),
+                                      limiter=AdaptiveLimiter.from_config(item.get('scheduler',
+                                                                                   config.get('scheduler'))),
+                                      **breaker))
+        return cls(endpoints, **options)
+
+    def capacity(self):
+        """
+        :return: 所有端点的最大并发数之和
+        """
+        return sum(endpoint.limiter.maximum for endpoint in self.endpoints)
+
+    def pick(self, model, avoid=(), strict=False):
+        """
+        选择在途请求数与权重之比最小的端点
+        优先选择熔断器关闭、未在限流暂停且不在avoid中的端点，没有时依次放宽条件
+        :param model: 请求的模型
+        :param avoid: 本次请求已经失败过的端点
+        :param strict: 为True时不放宽条件，没有合适端点时返回None(用于对冲)
+        """
+        serving = [endpoint for endpoint in self.endpoints if endpoint.serves(model) and not endpoint.disabled]
+        if not serving:
+            raise NoEndpointError(f"No available endpoint serves model {model}")
+        ready = [endpoint for endpoint in serving if endpoint.available()]
+        preferred = [endpoint for endpoint in ready if endpoint not in avoid and not endpoint.paused()]
+        if strict:
+            candidates = preferred
+        else:
+            # 全部熔断时选最早恢复的端点，保证请求仍能推进
+            candidates = preferred or ready or [min(serving, key=lambda endpoint: endpoint.opened_until)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda endpoint: ((endpoint.outstanding + 1) / endpoint.weight, random.random()))
+
+    def usable(self, model):
+        """
+        :return: 是否还有未停用且提供该模型的端点，为False时后续请求都会失败
+        """
+        return any(endpoint.serves(model) and not endpoint.disabled for endpoint in self.endpoints)
+
+    def can_failover(self, model, avoid=()):
+        """
+        :return: 是否还有可以立即接手的端点，有时重试不必等待
+        """
+        return any(endpoint.serves(model) and endpoint.available() and not endpoint.paused()
+                   and endpoint not in avoid for endpoint in self.endpoints)
+
+    def hedge_delay(self):
+        """
+        :return: 对冲延迟秒数，不对冲时返回None
+        """
+        if self.hedge_after is None or len(self.endpoints) < 2:
+            return None
+        if self.hedge_after != "auto":
+            return float(self.hedge_after)
+        if len(self._latencies) < self.min_samples:
+            return None
+        return percentile(sorted(self._latencies), self.hedge_percentile)
+
+    async def complete(self, messages, model, limiter=None, avoid=None, **params):
+        """
+        发送一次对话请求，必要时对冲
+        :param messages: 对话消息列表
+        :param model: 请求的模型
+        :param limiter: 指定时替代端点自己的调度器
+        :param avoid: 本次请求已经失败过的端点集合，失败的端点会被加入
+        :param params: 传给chat.completions.create的其他参数
+        :return: ChatCompletion
+        """
+        avoid = avoid if avoid is not None else set()
+        self.requests += 1
+        # 选中时立即计入在途请求，同一时刻发起的请求才能看到彼此
+        primary = self.pick(model, avoid)
+        probe = primary.on_dispatch()
+        tasks = {asyncio.create_task(self._send(primary, probe, messages, model, limiter, avoid, params))}
+        hedge = None
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                secondary = None
+                if not done and self.hedged < self.hedge_budget * self.requests:
+                    secondary = self.pick(model, avoid | {primary}, strict=True)
+                if secondary is not None:
+                    self.hedged += 1
+                    metrics.count("llm.hedged", model=model)
+                    probe = secondary.on_dispatch()
+                    hedge = asyncio.create_task(self._send(secondary, probe, messages, model, limiter, avoid,
+                                                           params))
+                    tasks.add(hedge)
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _send(self, endpoint, probe, messages, model, limiter, avoid, params):
+        import openai
+        limiter = limiter or endpoint.limiter
+        try:
+            async with limiter.slot(estimate_tokens(messages)):
+                start = time.perf_counter()
+                # 使用原始响应以读取速率限制头
+                with metrics.timer("llm.request", model=model, endpoint=endpoint.name):
+                    raw = await endpoint.client.chat.completions.with_raw_response.create(
+                        model=endpoint.model_for(model), messages=messages, **params)
+                self._latencies.append(time.perf_counter() - start)
+                limiter.on_success(raw.headers)
+            endpoint.on_success()
+            return raw.parse()
+        except openai.RateLimitError as e:
+            avoid.add(endpoint)
+            if error_code(e) == "insufficient_quota":
+                endpoint.disable()
+            else:
+                limiter.on_throttle(retry_after(e.response.headers))
+            raise
+        except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError):
+            avoid.add(endpoint)
+            endpoint.on_failure(probe)
+            raise
+        finally:
+            endpoint.on_done(probe)
+
+    def stats(self):
+        """
+        :return: 各端点的状态和对冲统计
+        """
+        return {"endpoints": {endpoint.name: endpoint.stats() for endpoint in self.endpoints},
+                "hedged": self.hedged, "hedge_wins": self.hedge_wins}
+
+
+def error_code(error):
+    body = error.body if isinstance(error.body, dict) else {}
+    return body.get("code") or (body.get("error") or {}).get("code")
@@ -0,0 +1,208 @@
+import re
+import time
+import random
+import asyncio
+import contextlib
+from utils.ratelimit import TokenBucket
+
+_DURATION_PATTERN = re.compile(r'([0-9]+(?:\.[0-9]+)?)(ms|s|m|h)')
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """
+    解析速率限制头中的时长，如 "1s"、"6m0s"、"20ms" 或纯秒数
+    :param value: 头字段的值
+    :return: 秒数，无法解析时返回None
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def retry_after(headers):
+    """
+    读取Retry-After / retry-after-ms头
+    :param headers: 响应头
+    :return: 建议等待的秒数，没有时返回None
+    """
+    if headers is None:
+        return None
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds is not None:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """
+    带完全抖动的指数退避时长
+    :param attempt: 第几次重试(从0开始)
+    :param base: 首次退避的上限秒数
+    :param cap: 退避上限秒数
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AdaptiveLimiter:
+    """
+    按AIMD调节并发度的LLM请求调度器
+    每次成功把并发上限加1/limit(约每轮加1)，遇到限流时乘以backoff并让所有请求暂停到
+    Retry-After之后；同时读取x-ratelimit-*头，在剩余请求数/令牌数见底时提前暂停到重置时间，
+    可选的rpm/tpm令牌桶在本地再做一层限速
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, backoff=0.5, cooldown=1.0,
+                 rpm=None, tpm=None, low_watermark=0.05):
+        """
+        :param initial: 初始并发上限
+        :param minimum: 并发上限的下界
+        :param maximum: 并发上限的上界
+        :param backoff: 限流时并发上限的乘数
+        :param cooldown: 两次乘性下降的最小间隔秒数，避免一批同时失败的请求把并发降到底
+        :param rpm: 每分钟请求数上限，None表示不在本地限速
+        :param tpm: 每分钟令牌数上限，None表示不在本地限速
+        :param low_watermark: 剩余令牌数低于上限的该比例时暂停到重置时间
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.low_watermark = low_watermark
+        self.in_flight = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = None
+        self._loop = None
+        self._requests = TokenBucket(rpm / 60, rpm) if rpm else None
+        self._tokens = TokenBucket(tpm / 60, tpm) if tpm else None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        从config.yaml的scheduler段构建
+        :param config: 配置字典，可为None
+        """
+        return cls(**(config or {}))
+
+    async def acquire(self, tokens=0):
+        """
+        占用一个并发名额，必要时等待暂停结束和本地限速
+        :param tokens: 本次请求的预估令牌数
+        """
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._requests is not None:
+                await self._requests.acquire()
+            if self._tokens is not None and tokens:
+                await self._tokens.acquire(min(tokens, self._tokens.capacity))
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self):
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    def _condition(self):
+        # asyncio原语绑定到首次使用的事件循环，多次asyncio.run时按循环重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+        return self._cond
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tokens=0):
+        await self.acquire(tokens)
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def on_success(self, headers=None):
+        """
+        请求成功：加性增大并发上限，并根据速率限制头判断是否需要提前暂停
+        :param headers: 响应头
+        """
+        if self._near_limit(headers):
+            return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self, delay=None):
+        """
+        请求被限流：乘性减小并发上限，并让所有请求暂停delay秒
+        :param delay: Retry-After给出的等待秒数
+        """
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self._last_decrease = now
+        if delay:
+            self._pause(delay)
+
+    def paused_for(self):
+        """
+        :return: 距暂停结束的秒数，未暂停时为0
+        """
+        return max(self._paused_until - time.monotonic(), 0.0)
+
+    def _pause(self, delay):
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def _near_limit(self, headers):
+        """
+        检查x-ratelimit-*头，剩余额度见底时暂停到对应的重置时间
+        :return: 是否接近限额
+        """
+        if headers is None:
+            return False
+        near = False
+        remaining_requests = _to_int(headers.get("x-ratelimit-remaining-requests"))
+        if remaining_requests is not None and remaining_requests <= self.in_flight:
+            self._pause(parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0)
+            near = True
+        remaining_tokens = _to_int(headers.get("x-ratelimit-remaining-tokens"))
+        limit_tokens = _to_int(headers.get("x-ratelimit-limit-tokens"))
+        if remaining_tokens is not None and limit_tokens and \
+                remaining_tokens < limit_tokens * self.low_watermark:
+            self._pause(parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0)
+            near = True
+        return near
+
+
+def _to_int(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(messages):
+    """
+    粗略估计消息的令牌数(约每4个字符1个令牌)
+    :param messages: 对话消息列表
+    """
+    return sum(len(message.get("content") or "") for message in messages) // 4 + 1
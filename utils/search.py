@@ -0,0 +1,178 @@
+import re
+import sqlite3
+import argparse
+
+# BM25各列的权重，顺序与FTS表的列一致：标题、摘要、总结、作者、arXiv分类
+COLUMN_WEIGHTS = (10.0, 1.0, 2.0, 3.0, 2.0)
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _clean_label(value):
+    # 与ArixvWriter.clean_category一致：去掉[]，多个取值时取第一个
+    return (value or "").replace("[", "").replace("]", "").split(",")[0].strip()
+
+
+def _join(value):
+    # 旧记录的authors/categories是字符串，新记录是列表
+    if isinstance(value, str):
+        return value
+    return " ".join(value or [])
+
+
+def _year_month(published):
+    match = re.match(r"(\d{4}-\d{2})", published or "")
+    return match.group(1) if match else "Unknown"
+
+
+def to_match_query(text, match_all=True):
+    """
+    把自由文本转换为FTS5查询，每个词加引号，避免用户输入被当作查询语法
+    :param match_all: True时要求包含所有词，False时包含任一词即可
+    :return: FTS5查询字符串，没有可用的词时返回None
+    """
+    tokens = [f'"{token}"' for token in _TOKEN_PATTERN.findall(text)]
+    return (" " if match_all else " OR ").join(tokens) or None
+
+
+class SearchIndex:
+    """
+    基于SQLite FTS5的论文全文索引，按BM25对标题、摘要、总结、作者和分类打分
+    docs表保存键和可过滤的字段(年月、方法、类型)，papers_fts表以相同的rowid保存全文；
+    连接在第一次使用时才打开，写入按批次提交
+    """
+
+    def __init__(self, path="papers_index.db", flush_every=50):
+        """
+        :param path: 索引文件路径
+        :param flush_every: 累计多少条写入后提交一次
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self._conn = None
+        self._pending = 0
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, "
+                               "link TEXT, title TEXT, year_month TEXT, method TEXT, type TEXT)")
+            for column in ("year_month", "method", "type"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_docs_{column} ON docs ({column})")
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5("
+                               "title, abstract, summary, authors, categories, tokenize='porter unicode61')")
+            self._conn.commit()
+        return self._conn
+
+    def add(self, key, entry):
+        """
+        写入或更新一篇论文，近似重复的占位记录不建索引
+        :param key: 论文键
+        :param entry: 论文记录
+        """
+        if not isinstance(entry, dict) or entry.get("duplicate_of"):
+            return
+        row = self.conn.execute(
+            "INSERT INTO docs (key, link, title, year_month, method, type) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET link = excluded.link, title = excluded.title, "
+            "year_month = excluded.year_month, method = excluded.method, type = excluded.type RETURNING id",
+            (key, entry.get("link") or key, (entry.get("title") or "").replace("\n", " "),
+             _year_month(entry.get("published")), _clean_label(entry.get("method")),
+             _clean_label(entry.get("type")))).fetchone()
+        self.conn.execute("DELETE FROM papers_fts WHERE rowid = ?", (row[0],))
+        self.conn.execute(
+            "INSERT INTO papers_fts (rowid, title, abstract, summary, authors, categories) VALUES (?, ?, ?, ?, ?, ?)",
+            (row[0], entry.get("title") or "", entry.get("abstract") or "", entry.get("summary") or "",
+             _join(entry.get("authors")), _join(entry.get("categories"))))
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def build(self, items):
+        """
+        从存储中批量建立索引，已有的论文会被更新
+        :param items: (键, 记录)的可迭代对象
+        :return: 处理的记录数
+        """
+        count = 0
+        for key, entry in items:
+            self.add(key, entry)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self):
+        if self._conn is not None and self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    def search(self, query, limit=10, method=None, paper_type=None, since=None, until=None, match_all=True):
+        """
+        按BM25相关度检索
+        :param query: 自由文本查询，为空时只按过滤条件列出论文
+        :param limit: 返回的最大条数
+        :param method: 方法类别
+        :param paper_type: 论文类型
+        :param since: 起始年月(含)，如 2024-01
+        :param until: 结束年月(含)
+        :param match_all: 是否要求包含所有查询词
+        :return: 结果字典列表，包含key、link、title、year_month、method、type和score(越小越相关)
+        """
+        self.flush()
+        conditions, params = [], []
+        for column, operator, value in (("d.method", "=", method), ("d.type", "=", paper_type),
+                                        ("d.year_month", ">=", since), ("d.year_month", "<=", until)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        if since is not None or until is not None:
+            # 日期未知的论文记为"Unknown"，按字符串比较会落在任意起始年月之后
+            conditions.append("d.year_month != 'Unknown'")
+
+        match = to_match_query(query or "", match_all)
+        if match:
+            weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+            sql = (f"SELECT d.key, d.link, d.title, d.year_month, d.method, d.type, bm25(papers_fts, {weights}) AS score "
+                   f"FROM papers_fts JOIN docs d ON d.id = papers_fts.rowid WHERE papers_fts MATCH ?")
+            params.insert(0, match)
+            order = "score"
+        else:
+            sql = "SELECT d.key, d.link, d.title, d.year_month, d.method, d.type, 0.0 AS score FROM docs d WHERE 1"
+            order = "d.id"
+        sql += "".join(f" AND {condition}" for condition in conditions) + f" ORDER BY {order} LIMIT ?"
+        columns = ("key", "link", "title", "year_month", "method", "type", "score")
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params + [limit])]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检索已总结的论文")
+    parser.add_argument("query", nargs="?", default="", help="检索词，为空时只按过滤条件列出")
+    parser.add_argument("--index", default="papers_index.db", help="索引文件路径")
+    parser.add_argument("--build", metavar="SUMMARY_PATH", help="先从总结结果(JSON/JSONL/SQLite)建立或更新索引")
+    parser.add_argument("--method", help="方法类别，如 memory")
+    parser.add_argument("--type", dest="paper_type", help="论文类型，如 survey")
+    parser.add_argument("--since", help="起始年月(含)，如 2024-01")
+    parser.add_argument("--until", help="结束年月(含)，如 2024-12")
+    parser.add_argument("--any", action="store_true", help="包含任一检索词即可")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    if args.build:
+        from utils.storage import open_storage
+        with open_storage(args.build, table="summaries") as storage:
+            print(f"Indexed {index.build(storage.items())} entries into {args.index}")
+    for rank, hit in enumerate(index.search(args.query, args.limit, args.method, args.paper_type,
+                                            args.since, args.until, match_all=not args.any), start=1):
+        print(f"{rank}. [{hit['year_month']}] [{hit['method']}/{hit['type']}] {hit['title']}\n   {hit['link']}")
+    index.close()
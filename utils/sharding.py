@@ -0,0 +1,179 @@
+import os
+import json
+import contextlib
+import time
+import socket
+import hashlib
+import logging
+import threading
+from utils.arxiv_id import canonical_id
+from utils.storage import atomic_write
+
+
+def shard_of(key, shards, entry=None):
+    """
+    按基础arXiv ID的哈希分片，同一论文的不同链接写法落在同一分片，结果与进程和机器无关
+    :param key: 论文键(链接)
+    :param shards: 分片数
+    :param entry: 条目内容，键不是arXiv链接时使用其中的id字段，都无法识别时按键本身哈希
+    :return: 分片编号
+    """
+    ref = canonical_id(key) or canonical_id((entry or {}).get("id")) or key
+    digest = hashlib.sha1(ref.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        # 写到一半的租约文件视为已过期
+        return {"owner": None, "expires": 0, "done": False}
+
+
+class Lease:
+    """
+    基于共享目录中租约文件的分片认领，可跨进程和跨机器使用(目录需在共享文件系统上)
+    租约文件记录持有者和过期时间，持有者在后台线程中定期续约；
+    持有者崩溃后租约过期，其他工作进程可以接管该分片并从已有输出继续
+    """
+
+    def __init__(self, path, owner=None, ttl=60.0):
+        """
+        :param path: 租约文件路径
+        :param owner: 持有者标识，默认为 主机名:进程号
+        :param ttl: 租约有效秒数，续约间隔为其三分之一
+        """
+        self.path = path
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.lost = False
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def state(self):
+        """
+        :return: 租约文件的内容，不存在时返回None
+        """
+        return _read(self.path)
+
+    def _record(self, done=False, **extra):
+        return {"owner": self.owner, "expires": time.time() + self.ttl, "done": done, **extra}
+
+    def _create(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(self._record(), file)
+        return True
+
+    def _take_over(self, stale):
+        # 先把过期租约改名为自己独占的文件，只有一个工作进程能改名成功
+        grave = f"{self.path}.{self.owner.replace(':', '-')}.stale"
+        try:
+            os.rename(self.path, grave)
+        except FileNotFoundError:
+            return False
+        if _read(grave) != stale:
+            # 改名前租约已被其他进程续约或接管，放回原处
+            try:
+                os.link(grave, self.path)
+            except FileExistsError:
+                pass
+            os.remove(grave)
+            return False
+        os.remove(grave)
+        return self._create()
+
+    def acquire(self):
+        """
+        尝试认领分片，成功后开始后台续约
+        :return: 是否认领成功；分片已完成或租约仍有效时返回False
+        """
+        acquired = self._create()
+        if not acquired:
+            current = self.state()
+            if current is None:
+                acquired = self._create()
+            elif not current.get("done") and current.get("expires", 0) < time.time():
+                logging.info(f"Lease {self.path} held by {current.get('owner')} expired, taking over.")
+                acquired = self._take_over(current)
+        if acquired:
+            self.lost = False
+            self._stop.clear()
+            self._heartbeat = threading.Thread(target=self._renew_loop, daemon=True)
+            self._heartbeat.start()
+        return acquired
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.ttl / 3):
+            if not self.renew():
+                logging.warning(f"Lease {self.path} was taken over by another worker.")
+                return
+
+    def renew(self):
+        """
+        续约；租约已被其他进程接管时设置lost并返回False
+        """
+        current = self.state()
+        if current is None or current.get("owner") != self.owner:
+            self.lost = True
+            return False
+        if not self._swap(self._record()):
+            self.lost = True
+        return not self.lost
+
+    def _swap(self, record):
+        """
+        仅当租约仍属于自己时替换租约文件，record为None时删除
+        先把租约文件改名为自己独占的文件，确认仍是自己的租约后再把新记录用硬链接放回(目标已存在时失败)，
+        不会覆盖在读取和写入之间发生的接管
+        :return: 是否替换成功
+        """
+        prefix = f"{self.path}.{self.owner.replace(':', '-')}"
+        if record is not None:
+            atomic_write(f"{prefix}.new", lambda file: json.dump(record, file))
+        try:
+            os.rename(self.path, f"{prefix}.held")
+        except FileNotFoundError:
+            swapped = False
+        else:
+            held = _read(f"{prefix}.held")
+            swapped = (held or {}).get("owner") == self.owner
+            if not swapped:
+                # 已被接管，把接管者的租约放回原处
+                with contextlib.suppress(FileExistsError):
+                    os.link(f"{prefix}.held", self.path)
+            elif record is not None:
+                try:
+                    os.link(f"{prefix}.new", self.path)
+                except FileExistsError:
+                    # 改名期间租约文件不存在，已被其他工作进程认领
+                    swapped = False
+            os.remove(f"{prefix}.held")
+        if record is not None:
+            os.remove(f"{prefix}.new")
+        return swapped
+
+    def release(self, done=False, **extra):
+        """
+        停止续约并释放租约
+        :param done: 分片是否已完成，完成的分片不会再被认领
+        :param extra: 写入租约文件的其他信息，如处理数量
+        """
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self.lost:
+            return
+        self._swap(self._record(done=True, **extra) if done else None)
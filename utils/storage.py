@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+
+
+def atomic_write(path, write, newline=None):
+    """
+    先写入同目录下的临时文件再替换目标文件，避免写到一半崩溃时损坏原文件
+    :param path: 目标文件路径
+    :param write: 接受文件对象的写入函数
+    :param newline: 传给open的newline参数，写CSV时为''
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline=newline) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class BaseStorage:
+    """
+    键值存储后端的公共接口
+    put只写入缓冲区，累计flush_every条或距上次落盘超过flush_interval秒时批量落盘
+    """
+
+    def __init__(self, path, flush_every=1, flush_interval=None):
+        """
+        :param path: 存储文件路径
+        :param flush_every: 累计多少条未落盘记录后自动落盘
+        :param flush_interval: 距上次落盘超过多少秒后自动落盘，None表示不按时间落盘
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def put(self, key, value):
+        """
+        写入一条记录
+        :param key: 记录键
+        :param value: 可JSON序列化的记录内容
+        """
+        self._pending[key] = value
+        if len(self._pending) >= self.flush_every or (
+                self.flush_interval is not None
+                and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        将缓冲区中的记录落盘
+        """
+        if self._pending:
+            self._write(self._pending)
+            self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None and key not in self:
+            raise KeyError(key)
+        return value
+
+    def _write(self, records):
+        raise NotImplementedError
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def items(self):
+        raise NotImplementedError
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+
+class _MemoryIndexedStorage(BaseStorage):
+    """
+    启动时把全部记录读入内存字典的文件型后端
+    """
+
+    def __init__(self, path, flush_every=1, flush_interval=None):
+        super().__init__(path, flush_every, flush_interval)
+        self._data = self._load() if os.path.exists(path) else {}
+
+    def _load(self):
+        raise NotImplementedError
+
+    def put(self, key, value):
+        self._data[key] = value
+        super().put(key, value)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        return iter(list(self._data.items()))
+
+
+class JsonStorage(_MemoryIndexedStorage):
+    """
+    兼容旧格式的单个JSON对象文件，每次落盘整体原子重写
+    """
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write(self, records):
+        atomic_write(self.path, lambda file: json.dump(self._data, file, ensure_ascii=False, indent=4))
+
+
+class JsonlStorage(_MemoryIndexedStorage):
+    """
+    追加写的JSONL日志，每行一条{"key": ..., "value": ...}记录，后写覆盖先写
+    日志行数超过有效记录数的compact_ratio倍时原子重写为紧凑日志
+    """
+
+    def __init__(self, path, flush_every=1, flush_interval=None, compact_ratio=2.0):
+        self.compact_ratio = compact_ratio
+        self._log_lines = 0
+        self._torn_tail = False
+        super().__init__(path, flush_every, flush_interval)
+        if self._torn_tail:
+            # 先修复残缺的末行，否则后续追加会和它拼在同一行
+            self.compact()
+
+    def _load(self):
+        data = {}
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下写了一半的最后一行，跳过即可
+                    self._torn_tail = True
+                    continue
+                self._log_lines += 1
+                if "key" in item:
+                    data[item["key"]] = item["value"]
+                else:
+                    # 兼容旧版fetcher写入的{"link": ..., "abstract": ...}格式
+                    data[item["link"]] = item["abstract"]
+        return data
+
+    def _write(self, records):
+        with open(self.path, "a", encoding="utf-8") as file:
+            for key, value in records.items():
+                file.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._log_lines += len(records)
+        if self._log_lines > max(len(self._data), 1) * self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        """
+        用当前有效记录原子重写日志，丢弃被覆盖的旧行
+        """
+        def write(file):
+            for key, value in self._data.items():
+                file.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+
+        atomic_write(self.path, write)
+        self._log_lines = len(self._data)
+
+
+class SqliteStorage(BaseStorage):
+    """
+    SQLite键值表，按键查询而不把全部记录读入内存
+    """
+
+    def __init__(self, path, table="records", flush_every=1, flush_interval=None):
+        super().__init__(path, flush_every, flush_interval)
+        self.table = table
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    def _write(self, records):
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in records.items()])
+
+    def get(self, key, default=None):
+        if key in self._pending:
+            return self._pending[key]
+        row = self.conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __contains__(self, key):
+        if key in self._pending:
+            return True
+        return self.conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        self.flush()
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def items(self):
+        self.flush()
+        for key, value in self.conn.execute(f"SELECT key, value FROM {self.table}"):
+            yield key, json.loads(value)
+
+    def close(self):
+        super().close()
+        self.conn.close()
+
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+def open_storage(path, table="records", flush_every=1, flush_interval=None):
+    """
+    按文件扩展名选择存储后端
+    :param path: .json / .jsonl / .db(.sqlite) 文件路径
+    :param table: SQLite后端使用的表名，同一个数据库可为不同阶段分表
+    :param flush_every: 累计多少条记录后批量落盘
+    :param flush_interval: 距上次落盘超过多少秒后自动落盘
+    :return: 存储后端实例
+    """
+    if path.endswith('.jsonl'):
+        return JsonlStorage(path, flush_every, flush_interval)
+    if path.endswith(SQLITE_SUFFIXES):
+        # SQLite库统一使用带索引列的论文库，供各阶段共享
+        from utils.paper_store import PaperStore
+        return PaperStore(path, table, flush_every, flush_interval)
+    return JsonStorage(path, flush_every, flush_interval)